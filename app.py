@@ -1,66 +1,50 @@
-import matplotlib.pyplot as plt  # type: ignore
-import matplotlib.font_manager as fm  # type: ignore
-from mplsoccer import VerticalPitch  # type: ignore
-import json
-import pandas as pd
 import time
-import requests
-from io import BytesIO
 import streamlit as st  # type: ignore
+from shotmap import core, imagecache, leagues, understat
+from shotmap.players_table import PlayersTable
 
 st.set_page_config(page_title="Shotmap Generator", page_icon=":soccer:")
 
+# Shot maps are rendered once, at download resolution, and the PNG bytes
+# are shared by every session through the process-wide image cache.
+RENDER_DPI = 300
+IMAGE_STYLE = f"png@{RENDER_DPI}"
+image_cache = imagecache.get_cache()
+
 
 @st.cache_data
 def load_data():
-    with open("players/players_data.json", encoding="utf-8") as p:
-        loaded = json.load(p)
-    df = pd.DataFrame(loaded)
-    return df
+    return PlayersTable.open().to_frame()
 
 
-@st.cache_data
+@st.cache_data(ttl=understat.PLAYER_TTL)
 def get_player_understat_data(player_id):
-    base_url = "https://understat.com"
-    player_url = f"{base_url}/getPlayerData/{player_id}"
+    return core.fetch(player_id)
 
-    try:
-        with requests.Session() as session:
-            session.headers.update(
-                {"User-Agent": "Mozilla/5.0", "X-Requested-With": "XMLHttpRequest"}
-            )
-            r = session.get(player_url)
-            if r.status_code == 200:
-                return r.json()
-    except Exception:
-        return None
-    return None
 
+@st.cache_data(ttl=understat.PLAYER_TTL)
+def get_season_table(player_id):
+    # Every season's totals and per 90 rates in one pass, so switching
+    # seasons only looks a row up.
+    return core.season_table(get_player_understat_data(player_id) or {})
+
+
+def image_key(player_id, season):
+    # A season in progress gains shots as games are played, so its maps
+    # are only reused within the player payload's TTL; past ones never change.
+    version = None
+    if season.isdigit() and int(season) >= understat.current_season():
+        version = int(time.time() // understat.PLAYER_TTL)
+    return (player_id, season, IMAGE_STYLE, version)
 
-@st.cache_data
-def check_if_team_in_league(league_name, season, team_name):
-    url = f"https://understat.com/getLeagueData/{league_name}/{season}"
-    try:
-        with requests.Session() as session:
-            session.headers.update(
-                {"User-Agent": "Mozilla/5.0", "X-Requested-With": "XMLHttpRequest"}
-            )
-            r = session.get(url)
-            if r.status_code == 200:
-                data = r.json()
-                main_data = data.get("dates", data.get("date", []))
-                for match in main_data:
-                    home_team = match.get("h", {}).get("title")
-                    away_team = match.get("a", {}).get("title")
-                    if home_team == team_name or away_team == team_name:
-                        return True
-    except Exception:
-        return False
-    return False
+
+@st.cache_resource
+def get_team_league_index():
+    return leagues.get_index()
 
 
 players_data = load_data()
-player_names = sorted(players_data["name"].unique().tolist())
+player_names = sorted(players_data["name"].dropna().unique().tolist())
 
 
 if "visitor_count" not in st.session_state:
@@ -70,8 +54,6 @@ st.session_state.visitor_count += 1
 
 if "generate_plot" not in st.session_state:
     st.session_state.generate_plot = False
-if "results_cache" not in st.session_state:
-    st.session_state.results_cache = {}
 
 st.title("Shot Map Generator")
 st.markdown(
@@ -112,16 +94,18 @@ with tab1:
             else:
                 player_id = str(new_df.iloc[0, 0])
 
-            player_json_data = get_player_understat_data(player_id)
+            # Players crawled from the JSON endpoint carry their seasons, so
+            # the player payload is only fetched once a map is requested.
+            table_seasons = (
+                new_df.iloc[0]["seasons"] if "seasons" in new_df.columns else None
+            )
+            if isinstance(table_seasons, list) and table_seasons:
+                available_seasons = table_seasons
+            else:
+                player_json_data = get_player_understat_data(player_id)
 
-            if (
-                player_json_data
-                and "groups" in player_json_data
-                and "season" in player_json_data["groups"]
-            ):
-                season_list = player_json_data["groups"]["season"]
-                unique_seasons = set(item["season"] for item in season_list)
-                available_seasons = sorted(list(unique_seasons), reverse=True)
+            if player_json_data:
+                available_seasons = list(get_season_table(player_id).index)
 
         season = st.selectbox(
             "Select season",
@@ -132,13 +116,14 @@ with tab1:
 
     button = st.button("Generate Shot Map")
 
-    if "fig" not in st.session_state:
-        st.session_state.fig = None
+    if "image" not in st.session_state:
+        st.session_state.image = None
 
     if button and input1 and season:
-        cache_key = f"{input1.lower()}_{season}"
-        if cache_key in st.session_state.results_cache:
-            st.session_state.fig = st.session_state.results_cache[cache_key]
+        cache_key = image_key(player_id, season)
+        cached_image = image_cache.get(cache_key)
+        if cached_image is not None:
+            st.session_state.image = cached_image
             st.session_state.generate_plot = True
             st.info("Retrieved from cache. Click on the Output tab to see the plot.")
         else:
@@ -154,597 +139,44 @@ with tab1:
                     show_time=True,
                 ):
                     try:
+                        if not player_json_data:
+                            player_json_data = get_player_understat_data(player_id)
                         if not player_json_data:
                             st.error("Could not retrieve data from Understat.")
                             st.stop()
 
-                        shots_data = player_json_data["shots"]
-                        df = pd.DataFrame(shots_data)
-                        df = df[df["season"] == season]
-
-                        if df.empty:
+                        shot_set = core.ShotSet.from_payload(player_json_data, season)
+                        if shot_set.empty:
                             st.error(f"No shots found for {input1} in {season}")
                             st.stop()
-
-                        df["X"] = pd.to_numeric(df["X"])
-                        df["Y"] = pd.to_numeric(df["Y"])
-                        df["xG"] = pd.to_numeric(df["xG"])
-
-                        player_name = input1
-
-                        season_groups = player_json_data.get("groups", {}).get(
-                            "season", []
-                        )
-
-                        current_season_entries = [
-                            item
-                            for item in season_groups
-                            if str(item["season"]) == str(season)
-                        ]
-
-                        unique_teams = list(
-                            set(item["team"] for item in current_season_entries)
+                        season_stats = core.SeasonStats.from_table(
+                            get_season_table(player_id), season
                         )
 
-                        leagues_to_check = [
-                            "EPL",
-                            "La_liga",
-                            "Bundesliga",
-                            "Serie_A",
-                            "Ligue_1",
-                            "RFPL",
-                        ]
-                        final_team_strings = []
-
                         progress_text = st.empty()
                         progress_text.text("Verifying leagues...")
-
-                        for team in unique_teams:
-                            found_league = None
-                            for league in leagues_to_check:
-                                if check_if_team_in_league(league, season, team):
-                                    found_league = league
-                                    break
-
-                            if found_league:
-                                clean_league = found_league.replace("_", " ")
-                                final_team_strings.append(f"{team} ({clean_league})")
-                            else:
-                                final_team_strings.append(f"{team} (Unknown)")
-
+                        get_team_league_index().season(season)
                         progress_text.empty()
-                        teams_title_str = " + ".join(final_team_strings)
-
-                        current_stats = [
-                            item
-                            for item in season_groups
-                            if str(item["season"]) == str(season)
-                        ]
-
-                        if current_stats:
-                            total_time = sum(
-                                float(item["time"]) for item in current_stats
-                            )
-                            total_xg_season = sum(
-                                float(item["xG"]) for item in current_stats
-                            )
-                            total_xa_season = sum(
-                                float(item["xA"]) for item in current_stats
-                            )
-                            total_shots_season = sum(
-                                int(item["shots"]) for item in current_stats
-                            )
-                            total_npxg_season = sum(
-                                float(item["npxG"]) for item in current_stats
-                            )
-                        else:
-                            total_time = 0
-                            total_xg_season = 0
-                            total_xa_season = 0
-                            total_shots_season = 0
-                            total_npxg_season = 0
-
-                        if total_time > 0:
-                            xg_p90 = total_xg_season / (total_time / 90)
-                            shots_p90 = total_shots_season / (total_time / 90)
-                            npxg_p90 = total_npxg_season / (total_time / 90)
-                            xgi_p90 = (total_xg_season + total_xa_season) / (
-                                total_time / 90
-                            )
-
-                        df["X"] = pd.to_numeric(df["X"])
-                        df["Y"] = pd.to_numeric(df["Y"])
-                        df["xG"] = pd.to_numeric(df["xG"])
-
-                        df["X"] = df["X"] * 100
-                        df["Y"] = df["Y"] * 100
-
-                        number_of_shots = df.shape[0]
-                        number_of_goals = df[df["result"] == "Goal"].shape[0]
-                        number_of_xg = df["xG"].sum()
-                        xg_per_shot = number_of_xg / float(number_of_shots)
-
-                        background_color = "#484e48"
-                        background_color2 = "#2c932f"
-
-                        font_path = "lato/Lato-Regular.ttf"
-                        font_props = fm.FontProperties(fname=font_path)
-
-                        fig = plt.figure(figsize=(9, 13))
-                        fig.patch.set_facecolor(background_color)
-
-                        ax1 = fig.add_axes([0, 0.7, 1, 0.2])
-                        for spine in ax1.spines.values():
-                            spine.set_visible(False)
-                        ax1.set_xticks([])
-                        ax1.set_yticks([])
-                        ax1.set_facecolor(background_color)
-                        ax1.set_xlim(0, 1)
-                        ax1.set_ylim(0, 1)
-
-                        ax1.text(
-                            x=0.5,
-                            y=0.85,
-                            s=player_name,
-                            fontsize=25,
-                            fontproperties=font_props,
-                            fontweight="bold",
-                            color="white",
-                            ha="center",
-                        )
-
-                        season_short = season[2:4]
-                        next_season_short = int(season_short) + 1
-
-                        ax1.text(
-                            x=0.5,
-                            y=0.71,
-                            s=f"Shot Map at {teams_title_str} for the {season_short}/{next_season_short} Season",
-                            fontsize=13,
-                            fontproperties=font_props,
-                            fontweight="bold",
-                            color="white",
-                            ha="center",
-                        )
-
-                        ax1.text(
-                            x=0.27,
-                            y=0.5,
-                            s="Low Quality Chance",
-                            fontsize=12,
-                            fontproperties=font_props,
-                            fontweight="bold",
-                            color="white",
-                            ha="center",
-                        )
-
-                        ax1.scatter(
-                            x=0.37,
-                            y=0.53,
-                            s=100,
-                            color=background_color,
-                            edgecolor="white",
-                            linewidth=0.8,
-                        )
-
-                        ax1.scatter(
-                            x=0.42,
-                            y=0.53,
-                            s=200,
-                            color=background_color,
-                            edgecolor="white",
-                            linewidth=0.8,
-                        )
-
-                        ax1.scatter(
-                            x=0.48,
-                            y=0.53,
-                            s=300,
-                            color=background_color,
-                            edgecolor="white",
-                            linewidth=0.8,
-                        )
-
-                        ax1.scatter(
-                            x=0.54,
-                            y=0.53,
-                            s=400,
-                            color=background_color,
-                            edgecolor="white",
-                            linewidth=0.8,
-                        )
-
-                        ax1.scatter(
-                            x=0.61,
-                            y=0.53,
-                            s=500,
-                            color=background_color,
-                            edgecolor="white",
-                            linewidth=0.8,
-                        )
-
-                        ax1.text(
-                            x=0.723,
-                            y=0.5,
-                            s="High Quality Chance",
-                            fontsize=12,
-                            fontproperties=font_props,
-                            fontweight="bold",
-                            color="white",
-                            ha="center",
-                        )
-
-                        ax1.text(
-                            x=0.096,
-                            y=0.286,
-                            s="- Shot Saved",
-                            fontsize=10,
-                            fontproperties=font_props,
-                            color="white",
-                        )
-
-                        ax1.scatter(
-                            x=0.08,
-                            y=0.3,
-                            s=150,
-                            color="yellow",
-                            edgecolor="white",
-                            linewidth=0.8,
-                            alpha=0.7,
-                        )
-
-                        ax1.text(
-                            x=0.216,
-                            y=0.286,
-                            s="- Blocked/Off Target",
-                            fontsize=10,
-                            fontproperties=font_props,
-                            color="white",
-                        )
-
-                        ax1.scatter(
-                            x=0.2,
-                            y=0.3,
-                            s=150,
-                            color=background_color,
-                            edgecolor="white",
-                            linewidth=0.8,
-                            alpha=0.7,
-                        )
-
-                        ax1.text(
-                            x=0.396,
-                            y=0.286,
-                            s="- Goal",
-                            fontsize=11,
-                            fontproperties=font_props,
-                            color="white",
-                        )
 
-                        ax1.scatter(
-                            x=0.38,
-                            y=0.3,
-                            s=150,
-                            color="red",
-                            edgecolor="white",
-                            linewidth=0.8,
-                            alpha=0.7,
+                        # Only the player layer is drawn; the legend, pitch and captions
+                        # come from a template rendered once per process.
+                        image = core.render_map(
+                            input1,
+                            season,
+                            shot_set,
+                            season_stats,
+                            get_team_league_index().league_of,
+                            dpi=RENDER_DPI,
                         )
 
-                        ax1.text(
-                            x=0.486,
-                            y=0.286,
-                            s="- Penalty Scored",
-                            fontsize=11,
-                            fontproperties=font_props,
-                            color="white",
-                        )
-
-                        ax1.scatter(
-                            x=0.47,
-                            y=0.3,
-                            s=150,
-                            color="blue",
-                            marker="s",
-                            edgecolor="white",
-                            linewidth=0.8,
-                            alpha=0.7,
-                        )
-
-                        ax1.text(
-                            x=0.646,
-                            y=0.286,
-                            s="- Penalty Missed",
-                            fontsize=11,
-                            fontproperties=font_props,
-                            color="white",
-                        )
-
-                        ax1.scatter(
-                            x=0.63,
-                            y=0.3,
-                            s=150,
-                            color="violet",
-                            marker="s",
-                            edgecolor="white",
-                            linewidth=0.8,
-                            alpha=0.7,
-                        )
-
-                        ax1.text(
-                            x=0.806,
-                            y=0.286,
-                            s="- Freekick Scored",
-                            fontsize=11,
-                            fontproperties=font_props,
-                            color="white",
-                        )
-
-                        ax1.scatter(
-                            x=0.79,
-                            y=0.3,
-                            s=150,
-                            color="turquoise",
-                            marker="^",
-                            edgecolor="white",
-                            linewidth=0.8,
-                            alpha=0.7,
-                        )
-
-                        ax1.text(
-                            x=0.83,
-                            y=-0.1,
-                            s="xG per 90",
-                            fontsize=20,
-                            fontproperties=font_props,
-                            fontweight="bold",
-                            color="white",
-                            ha="left",
-                        )
-
-                        ax1.text(
-                            x=0.88,
-                            y=-0.23,
-                            s=f"{xg_p90:.2f}",
-                            fontsize=18,
-                            fontproperties=font_props,
-                            fontweight="bold",
-                            color="white",
-                            ha="left",
-                        )
-
-                        ax1.text(
-                            x=0.82,
-                            y=-0.51,
-                            s="Shots per 90",
-                            fontsize=20,
-                            fontproperties=font_props,
-                            fontweight="bold",
-                            color="white",
-                            ha="left",
-                        )
-
-                        ax1.text(
-                            x=0.88,
-                            y=-0.63,
-                            s=f"{shots_p90:.2f}",
-                            fontsize=18,
-                            fontproperties=font_props,
-                            fontweight="bold",
-                            color="white",
-                            ha="left",
-                        )
-
-                        ax1.text(
-                            x=0.82,
-                            y=-0.9,
-                            s="npxG per 90",
-                            fontsize=20,
-                            fontproperties=font_props,
-                            fontweight="bold",
-                            color="white",
-                            ha="left",
-                        )
-
-                        ax1.text(
-                            x=0.88,
-                            y=-1.03,
-                            s=f"{npxg_p90:.2f}",
-                            fontsize=18,
-                            fontproperties=font_props,
-                            fontweight="bold",
-                            color="white",
-                            ha="left",
-                        )
-
-                        ax1.text(
-                            x=0.83,
-                            y=-1.3,
-                            s="xGI per 90",
-                            fontsize=20,
-                            fontproperties=font_props,
-                            fontweight="bold",
-                            color="white",
-                            ha="left",
-                        )
-
-                        ax1.text(
-                            x=0.88,
-                            y=-1.43,
-                            s=f"{xgi_p90:.2f}",
-                            fontsize=18,
-                            fontproperties=font_props,
-                            fontweight="bold",
-                            color="white",
-                            ha="left",
-                        )
-
-                        ax2 = fig.add_axes([0.05, 0.3, 0.72, 0.45])
-                        for spine in ax2.spines.values():
-                            spine.set_visible(False)
-                        ax2.set_xticks([])
-                        ax2.set_yticks([])
-                        ax2.set_facecolor(background_color2)
-
-                        pitch = VerticalPitch(
-                            pitch_type="opta",
-                            half=True,
-                            pitch_color=background_color2,
-                            pad_bottom=0.5,
-                            line_color="white",
-                            linewidth=0.75,
-                            axis=True,
-                            label=True,
-                        )
-
-                        pitch.draw(ax=ax2)
-
-                        for x in df.to_dict(orient="records"):
-                            pitch.scatter(
-                                x["X"],
-                                x["Y"],
-                                s=400 * x["xG"],
-                                color=(
-                                    "blue"
-                                    if x["result"] == "Goal"
-                                    and x["situation"] == "Penalty"
-                                    else "violet"
-                                    if x["result"] != "Goal"
-                                    and x["situation"] == "Penalty"
-                                    else "turquoise"
-                                    if x["result"] == "Goal"
-                                    and x["situation"] == "Freekick"
-                                    else "yellow"
-                                    if x["result"] == "SavedShot"
-                                    else "red"
-                                    if x["result"] == "Goal"
-                                    else background_color2
-                                ),
-                                marker=(
-                                    "s"
-                                    if x["situation"] == "Penalty"
-                                    else "^"
-                                    if x["situation"] == "Freekick"
-                                    else "o"
-                                ),
-                                ax=ax2,
-                                alpha=0.6,
-                                linewidth=0.8,
-                                edgecolor="white",
-                            )
-
-                        ax3 = fig.add_axes([0, 0.2, 1, 0.05])
-                        for spine in ax3.spines.values():
-                            spine.set_visible(False)
-                        ax3.set_xticks([])
-                        ax3.set_yticks([])
-                        ax3.set_facecolor(background_color)
-
-                        ax3.text(
-                            x=0.06,
-                            y=1.8,
-                            s="Total Shots",
-                            fontsize=20,
-                            fontproperties=font_props,
-                            fontweight="bold",
-                            color="white",
-                            ha="left",
-                        )
-
-                        ax3.text(
-                            x=0.12,
-                            y=1.4,
-                            s=f"{number_of_shots}",
-                            fontsize=18,
-                            fontproperties=font_props,
-                            fontweight="bold",
-                            color="white",
-                            ha="left",
-                        )
-
-                        ax3.text(
-                            x=0.25,
-                            y=1.8,
-                            s="Total Goals",
-                            fontsize=20,
-                            fontproperties=font_props,
-                            fontweight="bold",
-                            color="white",
-                            ha="left",
-                        )
-
-                        ax3.text(
-                            x=0.32,
-                            y=1.4,
-                            s=f"{number_of_goals}",
-                            fontsize=18,
-                            fontproperties=font_props,
-                            fontweight="bold",
-                            color="white",
-                            ha="left",
-                        )
-
-                        ax3.text(
-                            x=0.44,
-                            y=1.8,
-                            s="Total xG",
-                            fontsize=20,
-                            fontproperties=font_props,
-                            fontweight="bold",
-                            color="white",
-                            ha="left",
-                        )
-
-                        ax3.text(
-                            x=0.48,
-                            y=1.4,
-                            s=f"{number_of_xg:.2f}",
-                            fontsize=18,
-                            fontproperties=font_props,
-                            fontweight="bold",
-                            color="white",
-                            ha="left",
-                        )
-
-                        ax3.text(
-                            x=0.6,
-                            y=1.8,
-                            s="xG per Shot",
-                            fontsize=20,
-                            fontproperties=font_props,
-                            fontweight="bold",
-                            color="white",
-                            ha="left",
-                        )
-
-                        ax3.text(
-                            x=0.66,
-                            y=1.4,
-                            s=f"{xg_per_shot:.2f}",
-                            fontsize=18,
-                            fontproperties=font_props,
-                            fontweight="bold",
-                            color="white",
-                            ha="left",
-                        )
-
-                        ax3.text(
-                            x=0.29,
-                            y=0.05,
-                            s="Viz by @BetterThanMario | Created using https://shotmap.streamlit.app | Data: understat.com",
-                            fontsize=10,
-                            color="white",
-                            alpha=0.7,
-                        )
-
-                        st.session_state.fig = fig
+                        st.session_state.image = image
                         st.session_state.generate_plot = True
 
                         st.info(
                             "The shot map has been generated. Click on the Output tab to see the generated plot."
                         )
 
-                        st.session_state.results_cache[cache_key] = st.session_state.fig
+                        image_cache.put(cache_key, image)
 
                     except Exception as e:
                         st.error(f"Error generating shot map: {str(e)}")
@@ -772,17 +204,13 @@ with tab2:
 
     st.subheader("Your Shot Map will be generated here:")
 
-    if st.session_state.generate_plot and st.session_state.fig:
-        st.pyplot(st.session_state.fig, use_container_width=False)
+    if st.session_state.generate_plot and st.session_state.image:
+        st.image(st.session_state.image)
         file_name = f"{input1}_{season}_shot_map.png"
 
-        buf = BytesIO()
-        st.session_state.fig.savefig(buf, format="png", bbox_inches="tight", dpi=300)
-        buf.seek(0)
-
         st.download_button(
             label="Download the Shot Map (PNG)",
-            data=buf.getvalue(),
+            data=st.session_state.image,
             file_name=file_name,
             mime="image/png",
         )
@@ -3,11 +3,120 @@
 # Don't forget to add your pipeline to the ITEM_PIPELINES setting
 # See: https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 
+import json
+import os
+import time
 
 # useful for handling different item types with a single interface
 from itemadapter import ItemAdapter
+from scrapy.exceptions import DropItem  # type: ignore
+
+
+def load_players(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def read_jsonl(path):
+    """Yield records from a JSONL file, skipping a torn last line."""
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def write_players(path, players):
+    """Write players sorted by numeric ID, in the players_data.json layout."""
+    players = sorted(players, key=lambda p: int(p["player_id"]))
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8", newline="\n") as f:
+        json.dump(players, f, indent=4, ensure_ascii=False)
+    os.replace(tmp, path)
 
 
 class PlayersPipeline:
+    """Stream items to an append-only JSONL log, then compact it.
+
+    Each item is appended to ``.crawl/<spider>.jsonl`` as soon as it is
+    scraped. The file is fsynced every ``JSONL_FSYNC_ITEMS`` items or
+    ``JSONL_FSYNC_SECONDS`` seconds, so a killed crawl loses at most that
+    much and the next run picks the log back up. Items are de-duplicated by
+    ``player_id``: one whose every value already matches what the log holds
+    for its player (later fields win) is dropped, while one that changes a
+    value, such as a new league, is kept. When the spider closes, the log
+    is folded the same way into ``spider.players_file``, which is rewritten
+    sorted by ID, and the log is removed.
+    """
+
+    def __init__(self, fsync_items=100, fsync_seconds=5.0):
+        self.fsync_items = fsync_items
+        self.fsync_seconds = fsync_seconds
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(
+            fsync_items=crawler.settings.getint("JSONL_FSYNC_ITEMS", 100),
+            fsync_seconds=crawler.settings.getfloat("JSONL_FSYNC_SECONDS", 5.0),
+        )
+
+    def open_spider(self, spider):
+        self.path = os.path.join(".crawl", f"{spider.name}.jsonl")
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # player_id -> the log's records for that player, folded.
+        self.logged = {}
+        for record in read_jsonl(self.path):
+            self.logged.setdefault(record["player_id"], {}).update(record)
+        self.file = open(self.path, "a", encoding="utf-8")
+        self.unsynced = 0
+        self.synced_at = time.monotonic()
+
+    def sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.unsynced = 0
+        self.synced_at = time.monotonic()
+
     def process_item(self, item, spider):
+        record = {k: v for k, v in ItemAdapter(item).asdict().items() if v is not None}
+        logged = self.logged.setdefault(record["player_id"], {})
+        if all(logged.get(field) == value for field, value in record.items()):
+            raise DropItem(f"Duplicate player {record['player_id']}")
+        logged.update(record)
+
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.unsynced += 1
+        if (
+            self.unsynced >= self.fsync_items
+            or time.monotonic() - self.synced_at >= self.fsync_seconds
+        ):
+            self.sync()
         return item
+
+    def close_spider(self, spider):
+        self.sync()
+        self.file.close()
+
+        players = {p["player_id"]: p for p in load_players(spider.players_file)}
+        added = moved = 0
+        for record in read_jsonl(self.path):
+            current = players.get(record["player_id"])
+            if current is None:
+                players[record["player_id"]] = record
+                added += 1
+                continue
+            if "league" in record and record["league"] != current.get("league"):
+                moved += 1
+            current.update(record)
+
+        write_players(spider.players_file, players.values())
+        os.remove(self.path)
+        spider.logger.info(
+            f"Compacted into {spider.players_file}: {added} new players, "
+            f"{moved} league changes"
+        )
@@ -1,51 +1,355 @@
+import datetime
+import json
+import os
+
 import scrapy  # type: ignore
+from scrapy.exceptions import CloseSpider  # type: ignore
 from scrapy.spiders import CrawlSpider  # type: ignore
+from scrapy.spidermiddlewares.httperror import HttpError  # type: ignore
 
 
 class DetailsSpider(CrawlSpider):
+    """Walk Understat player IDs upwards from ``start_id``.
+
+    A sliding window of ``window`` IDs is kept in flight (every finished ID
+    schedules the next one), so Scrapy's concurrency and AutoThrottle decide
+    the pace. The highest ID below which every page has been handled is
+    checkpointed, and the crawl stops after ``stop_after`` consecutive
+    missing players. Only a 404 (or an empty JSON payload) counts as
+    missing: an ID whose request keeps failing otherwise (timeouts, 5xx and
+    429s that outlast Scrapy's retries) is re-queued up to
+    ``error_attempts`` times, then left for the next run, the checkpoint
+    staying below it. ``stop_after`` consecutive such IDs close the crawl.
+
+        scrapy crawl details -a start_id=13283 -a stop_after=200
+
+    With ``-a incremental=1`` the crawl starts after the highest
+    ``player_id`` already in ``players_file`` and also reads the current
+    season's league payloads to pick up league changes of known players.
+    Known players found in those payloads whose ``seasons`` lack the
+    current one get it added, so the app's season list doesn't go stale.
+    Either way PlayersPipeline merges the results into ``players_file``.
+
+    With ``-a source=json`` players are read from the small getPlayerData
+    JSON endpoint instead of the HTML page. Those items also carry the
+    ``seasons`` the player has data for and, when they play this season,
+    their current ``league``, resolved from the league payloads fetched
+    before probing starts.
+    """
+
     name = "details"
     allowed_domains = ["understat.com"]
     base_url = "https://understat.com/player/{}"
+    json_url = "https://understat.com/getPlayerData/{}"
+    league_url = "https://understat.com/getLeagueData/{}/{}"
+    leagues = ["EPL", "La_liga", "Bundesliga", "Serie_A", "Ligue_1", "RFPL"]
+    json_headers = {"X-Requested-With": "XMLHttpRequest"}
 
-    current_id = 13283
+    start_id = 13283
+    stop_after = 200
+    window = 64
+    error_attempts = 3
+    checkpoint = ".crawl/details.json"
+    incremental = False
+    source = "html"
+    players_file = "players_data.json"
 
-    def start_requests(self):
-        yield scrapy.Request(
-            self.base_url.format(self.current_id),
-            callback=self.parse_player,
+    def __init__(
+        self,
+        start_id=None,
+        stop_after=None,
+        window=None,
+        error_attempts=None,
+        checkpoint=None,
+        incremental=None,
+        source=None,
+        players_file=None,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        if start_id is not None:
+            self.start_id = int(start_id)
+        if stop_after is not None:
+            self.stop_after = int(stop_after)
+        if window is not None:
+            self.window = int(window)
+        if error_attempts is not None:
+            self.error_attempts = int(error_attempts)
+        if checkpoint is not None:
+            self.checkpoint = checkpoint
+        if incremental is not None:
+            self.incremental = str(incremental).lower() in ("1", "true", "yes")
+        if source is not None:
+            if source not in ("html", "json"):
+                raise ValueError(f"source must be 'html' or 'json', not {source!r}")
+            self.source = source
+        if players_file is not None:
+            self.players_file = players_file
+
+        self.known = {}
+        # Team title -> league name for the current season.
+        self.team_leagues = {}
+        # Player ID -> name, from the same payloads.
+        self.league_names = {}
+        self.pending_leagues = 0
+
+        # ID -> found, for completed IDs above the contiguous watermark;
+        # None for IDs that failed for good.
+        self.completed = {}
+        self.last_contiguous_id = self.start_id - 1
+        self.missing_run = 0
+        self.failed_run = 0
+        # (last_contiguous_id, missing_run) just below the first failed ID.
+        self.resume_point = None
+
+    def load_checkpoint(self):
+        if not os.path.exists(self.checkpoint):
+            return False
+        with open(self.checkpoint, encoding="utf-8") as f:
+            state = json.load(f)
+        # Re-probe the trailing missing IDs: they may have been assigned since.
+        self.last_contiguous_id = state["last_contiguous_id"] - state["missing_run"]
+        self.logger.info(f"Resuming after player ID {self.last_contiguous_id}")
+        return True
+
+    def load_known_players(self, resumed):
+        with open(self.players_file, encoding="utf-8") as f:
+            self.known = {p["player_id"]: p for p in json.load(f)}
+        max_known_id = max((int(i) for i in self.known), default=0)
+        # start_id doesn't apply here; only a checkpoint past the file does.
+        resume_id = self.last_contiguous_id if resumed else 0
+        self.last_contiguous_id = max(resume_id, max_known_id)
+        self.logger.info(
+            f"{len(self.known)} known players, probing from ID {max_known_id + 1}"
+        )
+
+    @staticmethod
+    def current_season():
+        today = datetime.date.today()
+        return today.year if today.month >= 7 else today.year - 1
+
+    def save_checkpoint(self):
+        os.makedirs(os.path.dirname(self.checkpoint) or ".", exist_ok=True)
+        last_contiguous_id, missing_run = self.resume_point or (
+            self.last_contiguous_id,
+            self.missing_run,
+        )
+        tmp = f"{self.checkpoint}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "last_contiguous_id": last_contiguous_id,
+                    "missing_run": missing_run,
+                },
+                f,
+            )
+        os.replace(tmp, self.checkpoint)
+
+    def player_request(self, player_id):
+        if self.source == "json":
+            url, callback = self.json_url, self.parse_player_json
+            headers = self.json_headers
+        else:
+            url, callback, headers = self.base_url, self.parse_player, None
+        return scrapy.Request(
+            url.format(player_id),
+            callback=callback,
             errback=self.handle_error,
+            headers=headers,
             dont_filter=True,
+            cb_kwargs={"player_id": player_id},
+            # Lowest IDs first, so the contiguous watermark keeps moving
+            # instead of the default LIFO queue starving the oldest requests.
+            priority=-player_id,
         )
 
-    def parse_player(self, response):
-        if "Page not found" in response.text:
-            self.logger.info(f"Player ID {self.current_id} not found. Skipping...")
+    def next_request(self):
+        self.next_id += 1
+        return self.player_request(self.next_id)
+
+    def first_window(self):
+        self.next_id = self.last_contiguous_id
+        for _ in range(self.window):
+            yield self.next_request()
+
+    def start_requests(self):
+        resumed = self.load_checkpoint()
+        if self.incremental:
+            self.load_known_players(resumed)
+        if not (self.incremental or self.source == "json"):
+            yield from self.first_window()
+            return
+
+        # Player probing waits for the league payloads, so that JSON items
+        # can be given their current league.
+        self.pending_leagues = len(self.leagues)
+        for league in self.leagues:
+            yield scrapy.Request(
+                self.league_url.format(league, self.current_season()),
+                callback=self.parse_league,
+                errback=self.handle_league_error,
+                headers=self.json_headers,
+                dont_filter=True,
+                cb_kwargs={"league": league},
+            )
+
+    async def start(self):
+        # Scrapy >= 2.13 entry point; start_requests() covers older versions.
+        for request in self.start_requests():
+            yield request
+
+    def mark_completed(self, player_id, found):
+        self.completed[player_id] = found
+        advanced = False
+        while self.last_contiguous_id + 1 in self.completed:
+            self.last_contiguous_id += 1
+            advanced = True
+            found = self.completed.pop(self.last_contiguous_id)
+            if found is None:
+                if self.resume_point is None:
+                    self.resume_point = (self.last_contiguous_id - 1, self.missing_run)
+                self.failed_run += 1
+            elif found:
+                self.missing_run = self.failed_run = 0
+            else:
+                self.missing_run += 1
+                self.failed_run = 0
+        if advanced:
+            self.save_checkpoint()
+        if self.missing_run >= self.stop_after:
+            raise CloseSpider(
+                f"{self.missing_run} consecutive missing players after ID "
+                f"{self.last_contiguous_id - self.missing_run}"
+            )
+        if self.failed_run >= self.stop_after:
+            raise CloseSpider(
+                f"{self.failed_run} consecutive failed requests after ID "
+                f"{self.last_contiguous_id - self.failed_run}; rerun to resume"
+            )
+
+    def league_done(self):
+        self.pending_leagues -= 1
+        if self.pending_leagues == 0:
+            yield from self.first_window()
+
+    def parse_league(self, response, league):
+        league_name = league.replace("_", " ")
+        data = response.json()
+        for match in data.get("dates", data.get("date", [])):
+            for side in ("h", "a"):
+                title = match.get(side, {}).get("title")
+                if title:
+                    self.team_leagues.setdefault(title, league_name)
+
+        for player in data.get("players", []):
+            if player.get("player_name"):
+                self.league_names[str(player["id"])] = player["player_name"]
+
+        season = str(self.current_season())
+        for player in data.get("players", []) if self.incremental else []:
+            player_id = str(player["id"])
+            known = self.known.get(player_id)
+            if known is None:
+                yield {
+                    "player_id": player_id,
+                    "name": player.get("player_name"),
+                    "league": league_name,
+                }
+                continue
+            update = {}
+            if known.get("league") != league_name:
+                self.logger.info(
+                    f"{known['name']} ({player_id}) moved from "
+                    f"{known.get('league')} to {league_name}"
+                )
+                update["league"] = league_name
+            seasons = known.get("seasons")
+            if isinstance(seasons, list) and season not in seasons:
+                update["seasons"] = sorted(set(seasons) | {season}, reverse=True)
+            if update:
+                yield {"player_id": player_id, **update}
+
+        yield from self.league_done()
+
+    def handle_league_error(self, failure):
+        self.logger.warning(f"League request failed: {repr(failure)}")
+        yield from self.league_done()
+
+    def parse_player_json(self, response, player_id):
+        try:
+            data = response.json()
+        except ValueError:
+            data = None
+        found = isinstance(data, dict) and bool(data.get("groups") or data.get("shots"))
+        if not found:
+            self.logger.info(f"Player ID {player_id} not found. Skipping...")
+        else:
+            season_groups = data.get("groups", {}).get("season", [])
+            shots = data.get("shots", [])
+            name = (
+                (data.get("player") or {}).get("name")
+                or (shots[0].get("player") if shots else None)
+                or self.league_names.get(str(player_id))
+                or self.known.get(str(player_id), {}).get("name")
+            )
+            item = {"player_id": str(player_id), "name": name}
+            current = [
+                entry
+                for entry in season_groups
+                if str(entry["season"]) == str(self.current_season())
+            ]
+            for entry in current:
+                league = self.team_leagues.get(entry.get("team"))
+                if league:
+                    item["league"] = league
+            item["seasons"] = sorted(
+                {str(entry["season"]) for entry in season_groups}, reverse=True
+            )
+            if name:
+                yield item
+            else:
+                self.logger.warning(f"No name for player ID {player_id}. Skipping...")
+
+        self.mark_completed(player_id, found)
+        yield self.next_request()
+
+    def parse_player(self, response, player_id):
+        found = "Page not found" not in response.text
+        if not found:
+            self.logger.info(f"Player ID {player_id} not found. Skipping...")
         else:
-            player_id = response.url.split("/")[-1]
             player_details = response.css("ul.breadcrumb")
 
             for p in player_details:
                 yield {
-                    "player_id": player_id,
+                    "player_id": str(player_id),
                     "name": p.css("li::text").get(),
                 }
 
-        self.current_id += 1
-        yield scrapy.Request(
-            self.base_url.format(self.current_id),
-            callback=self.parse_player,
-            errback=self.handle_error,
-            dont_filter=True,
-        )
+        self.mark_completed(player_id, found)
+        yield self.next_request()
 
     def handle_error(self, failure):
-        self.logger.info(
-            f"Error processing player ID {self.current_id}: {repr(failure)}"
-        )
-        self.current_id += 1
-        yield scrapy.Request(
-            self.base_url.format(self.current_id),
-            callback=self.parse_player,
-            errback=self.handle_error,
-            dont_filter=True,
+        request = failure.request
+        player_id = request.cb_kwargs["player_id"]
+        if failure.check(HttpError) and failure.value.response.status == 404:
+            self.logger.info(f"Player ID {player_id} not found. Skipping...")
+            self.mark_completed(player_id, False)
+            yield self.next_request()
+            return
+
+        attempts = request.meta.get("error_attempts", 0) + 1
+        self.logger.warning(
+            f"Error processing player ID {player_id} "
+            f"(attempt {attempts}/{self.error_attempts}): {repr(failure)}"
         )
+        if attempts < self.error_attempts:
+            retry = request.replace(dont_filter=True)
+            retry.meta["error_attempts"] = attempts
+            yield retry
+            return
+        self.mark_completed(player_id, None)
+        yield self.next_request()
+
+    def closed(self, reason):
+        self.save_checkpoint()
@@ -0,0 +1,289 @@
+"""Render many shot maps in one run.
+
+Jobs are (player, season) pairs, read from a file of ``player,season``
+lines (player being a name from players_data.json or an Understat id) or
+queried from a league season's player list:
+
+    python -m shotmap.batch jobs.csv
+    python -m shotmap.batch --league EPL --league La_liga --season 2024 \\
+        --min-minutes 900
+
+The parent process reads each player season from the shot warehouse when
+it is stored there (see shotmap.warehouse) and still fresh, i.e. a past
+season or one stored within understat.PLAYER_TTL, and otherwise fetches the
+payload once, through the shared cached client, then hands each worker the
+data it needs; workers only render, with the Agg backend. Maps whose inputs
+have not changed since the last run are skipped.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+
+from shotmap import core, leagues, render, understat
+from shotmap.players_table import PlayersTable
+from shotmap.warehouse import ShotWarehouse
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_DIR = "results"
+MANIFEST = ".batch.json"
+DPI = 300
+
+
+def read_jobs(path, table):
+    """(player_id, name, season) for every ``player,season`` line of a file."""
+    rows_by_name = table.rows_by_name()
+    rows_by_id = {str(pid): row for row, pid in enumerate(table.player_id.tolist())}
+    jobs = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if "," not in line:
+                logger.warning("Skipping line without a season: %r", line)
+                continue
+            player, season = (part.strip() for part in line.rsplit(",", 1))
+            if not (len(season) == 4 and season.isdigit()):
+                logger.warning("Skipping line with a bad season: %r", line)
+                continue
+            row = rows_by_id.get(player, rows_by_name.get(player.lower()))
+            if row is None:
+                logger.warning("Skipping unknown player %r", player)
+                continue
+            record = table.record(row)
+            jobs.append((record["player_id"], record["name"], season))
+    return jobs
+
+
+def query_jobs(league_names, season, min_minutes):
+    """Every player of the given league seasons with enough minutes."""
+    jobs = []
+    payloads = understat.get_league_data_many(
+        (league, season) for league in league_names
+    )
+    for league, data in zip(league_names, payloads):
+        if data is None:
+            logger.warning("Could not fetch %s %s", league, season)
+            continue
+        for player in data.get("players", []):
+            if float(player.get("time", 0)) >= min_minutes:
+                jobs.append((str(player["id"]), player["player_name"], str(season)))
+    return jobs
+
+
+def _shot_fields(shot):
+    # Warehouse rows are typed while fetched shots are strings; the digest
+    # must not tell them apart.
+    return {
+        "X": float(shot["X"]),
+        "Y": float(shot["Y"]),
+        "xG": float(shot["xG"]),
+        "result": str(shot["result"]),
+        "situation": str(shot["situation"]),
+    }
+
+
+def build_task(name, season, payload, league_of, output_dir):
+    """Everything a worker needs to render one map, or None if no shots."""
+    shots = [_shot_fields(shot) for shot in core.season_shots(payload, season)]
+    if not shots:
+        return None
+    shot_set = core.ShotSet.from_shots(shots)
+    season_stats = core.SeasonStats.from_payload(payload, season)
+    task = {
+        "path": os.path.join(output_dir, f"{name}_{season}.png"),
+        "shots": shots,
+        "title": name,
+        "subtitle": core.subtitle(season_stats.teams, season, league_of),
+        "stats": core.map_stats(shot_set, season_stats),
+        "dpi": DPI,
+        "credit": render.CREDIT,
+    }
+    task["digest"] = hashlib.sha256(
+        json.dumps(task, sort_keys=True).encode()
+    ).hexdigest()
+    return task
+
+
+def _init_worker():
+    import matplotlib
+
+    matplotlib.use("Agg")
+
+
+def render_task(task):
+    start = time.perf_counter()
+    image = render.render_image(
+        core.ShotSet.from_shots(task["shots"]).df,
+        task["title"],
+        task["subtitle"],
+        task["stats"],
+        dpi=task["dpi"],
+        credit=task["credit"],
+    )
+    tmp = f"{task['path']}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(image)
+    os.replace(tmp, task["path"])
+    return time.perf_counter() - start
+
+
+def _stored_payload(warehouse, player_id, season):
+    """The warehouse's copy of a player season, if it can't have gone stale."""
+    if warehouse is None:
+        return None
+    if int(season) >= understat.current_season():
+        fetched_at = warehouse.fetched_at(player_id, season)
+        if fetched_at is None or time.time() - fetched_at > understat.PLAYER_TTL:
+            return None
+    return warehouse.payload(player_id, season)
+
+
+def _payload_future(warehouse, player_id, season):
+    payload = _stored_payload(warehouse, player_id, season)
+    if payload is None:
+        return understat.get_player_data_async(player_id), False
+    future = Future()
+    future.set_result(payload)
+    return future, True
+
+
+def run(jobs, output_dir=OUTPUT_DIR, workers=None, force=False, warehouse=None):
+    """Render ``jobs``; returns outcome counts and stage timings.
+
+    Repeated jobs are rendered once; ``jobs`` counts the distinct ones.
+    Past player seasons held by ``warehouse``, and current ones stored
+    within understat.PLAYER_TTL, are read from it instead of being fetched;
+    ``stored`` counts them.
+    """
+    jobs = list(dict.fromkeys(jobs))
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+
+    start = time.perf_counter()
+    for season in sorted({season for _, _, season in jobs}):
+        leagues.get_index().season(season)
+    outcome = {
+        "jobs": len(jobs),
+        "rendered": 0,
+        "skipped": 0,
+        "empty": 0,
+        "failed": 0,
+        "stored": 0,
+    }
+    futures = []
+    for job in jobs:
+        future, stored = _payload_future(warehouse, job[0], job[2])
+        outcome["stored"] += stored
+        futures.append((job, future))
+
+    tasks = []
+    for (player_id, name, season), future in futures:
+        payload = future.result()
+        if payload is None:
+            logger.warning("Could not fetch player %s", player_id)
+            outcome["failed"] += 1
+            continue
+        task = build_task(name, season, payload, leagues.league_of, output_dir)
+        if task is None:
+            outcome["empty"] += 1
+        elif (
+            not force
+            and manifest.get(task["path"]) == task["digest"]
+            and os.path.exists(task["path"])
+        ):
+            outcome["skipped"] += 1
+        else:
+            tasks.append(task)
+    fetched = time.perf_counter()
+
+    render_seconds = 0.0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        pending = {pool.submit(render_task, task): task for task in tasks}
+        for future in as_completed(pending):
+            task = pending[future]
+            try:
+                render_seconds += future.result()
+            except Exception:
+                logger.exception("Rendering %s failed", task["path"])
+                outcome["failed"] += 1
+                continue
+            manifest[task["path"]] = task["digest"]
+            outcome["rendered"] += 1
+
+    tmp = f"{manifest_path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, manifest_path)
+
+    done = time.perf_counter()
+    outcome.update(
+        fetch_seconds=fetched - start,
+        render_seconds=done - fetched,
+        cpu_seconds=render_seconds,
+    )
+    return outcome
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render many shot maps at once.")
+    parser.add_argument("jobs", nargs="?", help="file of player,season lines")
+    parser.add_argument(
+        "--league",
+        action="append",
+        choices=leagues.LEAGUES,
+        help="render every player of this league (repeatable)",
+    )
+    parser.add_argument("--season", help="season for --league, e.g. 2024")
+    parser.add_argument(
+        "--min-minutes",
+        type=float,
+        default=900,
+        help="minutes a --league player needs to be included",
+    )
+    parser.add_argument("--output", default=OUTPUT_DIR)
+    parser.add_argument("--workers", type=int, help="render processes")
+    parser.add_argument(
+        "--force", action="store_true", help="re-render up-to-date maps"
+    )
+    args = parser.parse_args(argv)
+    if bool(args.jobs) == bool(args.league):
+        parser.error("give either a jobs file or --league")
+    if args.league and not args.season:
+        parser.error("--league needs --season")
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.jobs:
+        jobs = read_jobs(args.jobs, PlayersTable.open())
+    else:
+        jobs = query_jobs(args.league, args.season, args.min_minutes)
+
+    outcome = run(
+        jobs, args.output, args.workers, args.force, ShotWarehouse.open_existing()
+    )
+    wall = outcome["fetch_seconds"] + outcome["render_seconds"]
+    rate = outcome["rendered"] / outcome["render_seconds"] if outcome["rendered"] else 0
+    print(
+        f"{outcome['jobs']} jobs: {outcome['rendered']} rendered, "
+        f"{outcome['skipped']} up to date, {outcome['empty']} without shots, "
+        f"{outcome['failed']} failed"
+    )
+    print(
+        f"fetch {outcome['fetch_seconds']:.1f}s ({outcome['stored']} from the"
+        f" warehouse), render {outcome['render_seconds']:.1f}s"
+        f" ({rate:.2f} maps/s, {outcome['cpu_seconds']:.1f} worker-s), total {wall:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""The shot map pipeline shared by shot.py, app.py and the batch renderer.
+
+    payload = fetch(player_id)
+    shot_set = ShotSet.from_payload(payload, season)
+    season_stats = SeasonStats.from_payload(payload, season)
+    image = render_map(name, season, shot_set, season_stats, league_of)
+
+Each stage is a plain function of the previous one's output, so it can be
+cached, profiled or run in another process on its own.
+"""
+
+from shotmap import render, understat
+
+
+def fetch(player_id):
+    """The getPlayerData payload of a player, or None."""
+    return understat.get_player_data(player_id)
+
+
+def season_shots(payload, season):
+    return [
+        shot for shot in payload.get("shots", []) if str(shot["season"]) == str(season)
+    ]
+
+
+class ShotSet:
+    """One player's shots in one season: X and Y on the 0-100 Opta pitch."""
+
+    def __init__(self, df):
+        self.df = df
+
+    @classmethod
+    def from_shots(cls, shots):
+        import pandas as pd
+
+        df = pd.DataFrame(shots, columns=["X", "Y", "xG", "result", "situation"])
+        df["X"] = pd.to_numeric(df["X"]) * 100
+        df["Y"] = pd.to_numeric(df["Y"]) * 100
+        df["xG"] = pd.to_numeric(df["xG"])
+        return cls(df)
+
+    @classmethod
+    def from_payload(cls, payload, season):
+        return cls.from_shots(season_shots(payload, season))
+
+    def __len__(self):
+        return len(self.df)
+
+    @property
+    def empty(self):
+        return self.df.empty
+
+    def totals(self):
+        shots = len(self.df)
+        xg = float(self.df["xG"].sum())
+        return {
+            "shots": shots,
+            "goals": int((self.df["result"] == "Goal").sum()),
+            "xg": xg,
+            "xg_per_shot": xg / shots if shots else 0.0,
+        }
+
+
+# groups.season columns summed per season, and their types.
+SEASON_COLUMNS = {"time": float, "xG": float, "xA": float, "shots": int, "npxG": float}
+PER90_COLUMNS = ("xg_p90", "shots_p90", "npxg_p90", "xgi_p90")
+
+
+def season_table(payload):
+    """Totals and per 90 rates of every season, indexed by season.
+
+    The ``groups.season`` rows (one per season and team, so a mid-season
+    move gives two) are parsed once into typed columns and summed per
+    season in a single groupby; the rates are then computed column-wise.
+    """
+    import pandas as pd
+
+    rows = payload.get("groups", {}).get("season", [])
+    df = pd.DataFrame(rows, columns=["season", "team", *SEASON_COLUMNS])
+    df["season"] = df["season"].astype(str)
+    df = df.astype(SEASON_COLUMNS)
+
+    grouped = df.groupby("season", sort=False)
+    table = grouped[list(SEASON_COLUMNS)].sum()
+    table["teams"] = grouped["team"].agg(lambda teams: sorted(set(teams)))
+
+    nineties = (table["time"] / 90).where(table["time"] > 0)
+    table["xg_p90"] = table["xG"] / nineties
+    table["shots_p90"] = table["shots"] / nineties
+    table["npxg_p90"] = table["npxG"] / nineties
+    table["xgi_p90"] = (table["xG"] + table["xA"]) / nineties
+    table[list(PER90_COLUMNS)] = table[list(PER90_COLUMNS)].fillna(0.0)
+    return table.sort_index(ascending=False)
+
+
+class SeasonStats:
+    """One season's row of ``season_table``: totals, teams and per 90 rates."""
+
+    def __init__(self, teams, time, xg, xa, shots, npxg, per90):
+        self.teams = teams
+        self.time = time
+        self.xg = xg
+        self.xa = xa
+        self.shots = shots
+        self.npxg = npxg
+        self._per90 = per90
+
+    @classmethod
+    def from_table(cls, table, season):
+        season = str(season)
+        if season not in table.index:
+            return cls([], 0.0, 0.0, 0.0, 0, 0.0, dict.fromkeys(PER90_COLUMNS, 0))
+        row = table.loc[season]
+        return cls(
+            list(row["teams"]),
+            float(row["time"]),
+            float(row["xG"]),
+            float(row["xA"]),
+            int(row["shots"]),
+            float(row["npxG"]),
+            {column: float(row[column]) for column in PER90_COLUMNS},
+        )
+
+    @classmethod
+    def from_payload(cls, payload, season):
+        return cls.from_table(season_table(payload), season)
+
+    def per90(self):
+        return dict(self._per90)
+
+
+def teams_title(teams, season, league_of):
+    """'Liverpool (EPL) + ...', with ``league_of(season, team)`` per team."""
+    labels = []
+    for team in teams:
+        league = league_of(season, team)
+        labels.append(f"{team} ({league.replace('_', ' ') if league else 'Unknown'})")
+    return " + ".join(labels)
+
+
+def subtitle(teams, season, league_of):
+    short = season[2:4]
+    return (
+        f"Shot Map at {teams_title(teams, season, league_of)}"
+        f" for the {short}/{int(short) + 1} Season"
+    )
+
+
+def map_stats(shot_set, season_stats):
+    """The numbers a shot map shows, keyed as render.PER90_STATS/TOTAL_STATS."""
+    return {**season_stats.per90(), **shot_set.totals()}
+
+
+def render_map(
+    name,
+    season,
+    shot_set,
+    season_stats,
+    league_of,
+    dpi=300,
+    format="png",
+    credit=render.CREDIT,
+    credit_x=render.CREDIT_X,
+):
+    """Encoded shot map image; see render.render_image."""
+    return render.render_image(
+        shot_set.df,
+        name,
+        subtitle(season_stats.teams, season, league_of),
+        map_stats(shot_set, season_stats),
+        dpi=dpi,
+        format=format,
+        credit=credit,
+        credit_x=credit_x,
+    )
@@ -0,0 +1,140 @@
+"""Process-wide cache of rendered shot map images.
+
+Encoded image bytes are kept in memory under a byte budget with LRU
+eviction, and optionally mirrored to a directory so they survive restarts.
+Keys are (player_id, season, style, version) tuples, style naming the
+render options (format, DPI, ...) that produced the bytes and version the
+data they were drawn from.
+"""
+
+import hashlib
+import os
+import threading
+from collections import Counter, OrderedDict
+
+MEMORY_BUDGET = int(os.environ.get("SHOTMAP_IMAGE_CACHE_MB", "64")) * 2**20
+# Directory for the on-disk copy; unset keeps the cache in memory only.
+DISK_DIR = os.environ.get("SHOTMAP_IMAGE_CACHE_DIR")
+DISK_BUDGET = int(os.environ.get("SHOTMAP_IMAGE_CACHE_DISK_MB", "512")) * 2**20
+
+
+class ImageCache:
+    """LRU map of key -> bytes holding at most ``max_bytes`` in memory.
+
+    ``stats`` counts hits (from memory), disk_hits, misses, stores and
+    evictions.
+    """
+
+    def __init__(self, max_bytes=MEMORY_BUDGET, disk_dir=None, disk_bytes=DISK_BUDGET):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_bytes = disk_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.stats = Counter()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        digest = hashlib.sha256(repr(key).encode()).hexdigest()[:32]
+        return os.path.join(self.disk_dir, f"{digest}.img")
+
+    def _insert(self, key, data):
+        if key in self.entries:
+            self.size -= len(self.entries.pop(key))
+        if len(data) > self.max_bytes:
+            return
+        self.entries[key] = data
+        self.size += len(data)
+        while self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+            self.stats["evictions"] += 1
+
+    def get(self, key):
+        with self.lock:
+            data = self.entries.get(key)
+            if data is not None:
+                self.entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return data
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                data = None
+            if data is not None:
+                os.utime(path)
+                with self.lock:
+                    self._insert(key, data)
+                    self.stats["disk_hits"] += 1
+                return data
+
+        with self.lock:
+            self.stats["misses"] += 1
+        return None
+
+    def put(self, key, data):
+        with self.lock:
+            self._insert(key, data)
+            self.stats["stores"] += 1
+        if self.disk_dir:
+            path = self._disk_path(key)
+            tmp = f"{path}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+            self._prune_disk()
+
+    def get_or_render(self, key, render):
+        """Cached bytes for ``key``, calling ``render()`` to fill a miss."""
+        data = self.get(key)
+        if data is None:
+            data = render()
+            self.put(key, data)
+        return data
+
+    def _prune_disk(self):
+        files = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.name.endswith(".img"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def info(self):
+        """Stats plus entry count, bytes held and the hit rate (memory or disk)."""
+        with self.lock:
+            info = dict(self.stats)
+            info.update(entries=len(self.entries), bytes=self.size)
+        lookups = sum(info.get(k, 0) for k in ("hits", "disk_hits", "misses"))
+        info["hit_rate"] = (
+            (info.get("hits", 0) + info.get("disk_hits", 0)) / lookups
+            if lookups
+            else 0.0
+        )
+        return info
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ImageCache(disk_dir=DISK_DIR)
+        return _cache
@@ -0,0 +1,103 @@
+"""(season, team) -> league index built from Understat league payloads."""
+
+import json
+import os
+import threading
+
+from shotmap import understat
+
+LEAGUES = ["EPL", "La_liga", "Bundesliga", "Serie_A", "Ligue_1", "RFPL"]
+
+
+def teams_in_league(data):
+    teams = set()
+    for match in data.get("dates", data.get("date", [])):
+        for side in ("h", "a"):
+            title = match.get(side, {}).get("title")
+            if title:
+                teams.add(title)
+    return teams
+
+
+class TeamLeagueIndex:
+    """Persisted ``{season: {team: league}}`` map.
+
+    A season is built from one getLeagueData fetch per league, run in
+    parallel, the first time it is asked for, and only written to disk once every league
+    answered, so a failed fetch is retried on the next lookup. When a team
+    shows up in several leagues the first one in ``LEAGUES`` wins, as the
+    old per-league probe did.
+
+    With ``persist=False`` the index lives in memory only, neither read
+    from nor written to ``path``; a snapshot replay uses that, so bundle
+    data never ends up in the index of later live runs.
+    """
+
+    def __init__(self, path=None, persist=True):
+        self.path = path or os.path.join(understat.CACHE_DIR, "team_leagues.json")
+        self.persist = persist
+        self.lock = threading.Lock()
+        # One lock per season being built, so lookups of other seasons
+        # don't wait on its fetches.
+        self.season_locks = {}
+        self.seasons = {}
+        if persist and os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                self.seasons = json.load(f)
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.seasons, f, ensure_ascii=False, sort_keys=True)
+        os.replace(tmp, self.path)
+
+    def season(self, season):
+        season = str(season)
+        mapping = self.seasons.get(season)
+        if mapping is not None:
+            return mapping
+        with self.lock:
+            season_lock = self.season_locks.setdefault(season, threading.Lock())
+
+        with season_lock:
+            if season in self.seasons:
+                return self.seasons[season]
+
+            mapping = {}
+            complete = True
+            payloads = understat.get_league_data_many(
+                (league, season) for league in LEAGUES
+            )
+            for league, data in zip(LEAGUES, payloads):
+                if data is None:
+                    complete = False
+                    continue
+                for team in teams_in_league(data):
+                    mapping.setdefault(team, league)
+
+            if complete:
+                with self.lock:
+                    self.seasons[season] = mapping
+                    if self.persist:
+                        self._save()
+            return mapping
+
+    def league_of(self, season, team):
+        return self.season(season).get(team)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = TeamLeagueIndex(persist=not understat.get_client().replay)
+        return _index
+
+
+def league_of(season, team):
+    return get_index().league_of(season, team)
@@ -0,0 +1,584 @@
+"""Player name resolution against players/players_data.json."""
+
+import hashlib
+import json
+import logging
+import os
+import unicodedata
+
+import numpy as np
+
+PLAYERS_PATH = "players/players_data.json"
+INDEX_DIR = "players/.index"
+MODEL_NAME = "all-MiniLM-L6-v2"
+MODEL_DIR = "models/all-MiniLM-L6-v2"
+MODEL_MODES = ("fp32", "int8", "onnx")
+
+logger = logging.getLogger(__name__)
+
+
+def file_digest(path, length=16):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()[:length]
+
+
+def load_names(path=PLAYERS_PATH):
+    from shotmap.players_table import PlayersTable
+
+    return PlayersTable.open(path).names()
+
+
+def _index_path(index_dir, prefix, digest, ext):
+    return os.path.join(index_dir, f"{prefix}-{digest}.{ext}")
+
+
+def _remove_stale(keep):
+    """Remove the files ``keep`` supersedes: same prefix and key, older digest.
+
+    Files of other model keys (e.g. the fp32 matrix when int8 is built)
+    are left alone.
+    """
+    index_dir, name = os.path.split(keep)
+    stem = name.rsplit("-", 1)[0] + "-"
+    for entry in os.listdir(index_dir):
+        if entry.startswith(stem) and "-" not in entry[len(stem) :] and entry != name:
+            os.remove(os.path.join(index_dir, entry))
+
+
+def _save_atomic(path, array):
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp, path)
+
+
+def _top_k(scores, k):
+    if k >= len(scores):
+        top = np.argsort(-scores)
+    else:
+        top = np.argpartition(-scores, k)[:k]
+        top = top[np.argsort(-scores[top])]
+    return top, scores[top]
+
+
+def _top_k_rows(scores, k):
+    k = min(k, scores.shape[1])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1)
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(
+        top_scores, order, axis=1
+    )
+
+
+class BruteForceBackend:
+    """Exact search: one matrix-vector product over every name."""
+
+    def __init__(self, embeddings, index_dir, key):
+        self.embeddings = embeddings
+
+    def search(self, query, k=1):
+        return _top_k(self.embeddings @ query, k)
+
+    def search_batch(self, queries, k=1):
+        return _top_k_rows(queries @ self.embeddings.T, k)
+
+
+class HNSWBackend:
+    """Approximate search over an on-disk hnswlib graph.
+
+    The graph is stored next to the embedding matrix under the same key, so
+    it is rebuilt together with it when players_data.json changes.
+    """
+
+    def __init__(self, embeddings, index_dir, key, m=16, ef_construction=200, ef=64):
+        try:
+            import hnswlib  # type: ignore
+        except ImportError as e:
+            raise ImportError(
+                "The hnsw matching backend needs hnswlib: pip install hnswlib"
+            ) from e
+
+        count, dim = embeddings.shape
+        path = _index_path(index_dir, "hnsw", key, "bin")
+        self.index = hnswlib.Index(space="ip", dim=dim)
+        if os.path.exists(path):
+            self.index.load_index(path, max_elements=count)
+        else:
+            self.index.init_index(
+                max_elements=count, ef_construction=ef_construction, M=m
+            )
+            self.index.add_items(np.asarray(embeddings), np.arange(count))
+            tmp = f"{path}.tmp"
+            self.index.save_index(tmp)
+            os.replace(tmp, path)
+            _remove_stale(path)
+        self.index.set_ef(max(ef, 1))
+
+    def search(self, query, k=1):
+        k = min(k, self.index.get_current_count())
+        self.index.set_ef(max(self.index.ef, k))
+        labels, distances = self.index.knn_query(query, k=k)
+        # hnswlib reports inner-product distance as 1 - dot.
+        return labels[0].astype(np.int64), 1.0 - distances[0]
+
+    def search_batch(self, queries, k=1):
+        k = min(k, self.index.get_current_count())
+        self.index.set_ef(max(self.index.ef, k))
+        labels, distances = self.index.knn_query(queries, k=k)
+        return labels.astype(np.int64), 1.0 - distances
+
+
+BACKENDS = {
+    "brute": BruteForceBackend,
+    "hnsw": HNSWBackend,
+}
+
+
+class NameIndex:
+    """Unit-normalised name embeddings, memory-mapped from disk.
+
+    The matrix is keyed by a hash of the players file and rebuilt only when
+    that file changes, so a lookup costs one query encode plus a search in
+    the selected nearest-neighbour backend (see ``BACKENDS``).
+    """
+
+    def __init__(self, names, embeddings, model, backend):
+        self.names = names
+        self.embeddings = embeddings
+        self.model = model
+        self.backend = backend
+
+    @classmethod
+    def open(
+        cls,
+        model,
+        names=None,
+        path=PLAYERS_PATH,
+        index_dir=INDEX_DIR,
+        backend="brute",
+        model_key=MODEL_NAME,
+    ):
+        if backend not in BACKENDS:
+            raise ValueError(
+                f"Unknown matching backend {backend!r}, expected one of {sorted(BACKENDS)}"
+            )
+        if names is None:
+            names = load_names(path)
+        key = f"{model_key}-{file_digest(path)}"
+        emb_path = _index_path(index_dir, "names", key, "npy")
+
+        if not os.path.exists(emb_path):
+            embeddings = model.encode(
+                names,
+                batch_size=256,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+            ).astype(np.float32)
+            os.makedirs(index_dir, exist_ok=True)
+            _save_atomic(emb_path, embeddings)
+            _remove_stale(emb_path)
+
+        embeddings = np.load(emb_path, mmap_mode="r")
+        if embeddings.shape[0] != len(names):
+            raise ValueError(
+                f"Name index {emb_path} has {embeddings.shape[0]} rows, expected {len(names)}"
+            )
+        return cls(
+            names, embeddings, model, BACKENDS[backend](embeddings, index_dir, key)
+        )
+
+    def encode(self, text):
+        return self.model.encode(
+            text, convert_to_numpy=True, normalize_embeddings=True
+        ).astype(np.float32)
+
+    def encode_batch(self, texts):
+        return self.model.encode(
+            list(texts),
+            batch_size=256,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+        ).astype(np.float32)
+
+    def similarities(self, text):
+        return self.embeddings @ self.encode(text)
+
+    def search(self, text, k=1):
+        indices, scores = self.backend.search(self.encode(text), k)
+        return [(self.names[i], float(score)) for i, score in zip(indices, scores)]
+
+    def search_batch(self, texts, k=1):
+        """Top-k ``(name, score)`` lists for many queries at once.
+
+        The queries go through the model in one batched forward pass and
+        are scored against the name matrix with a single matrix multiply.
+        """
+        if not texts:
+            return []
+        indices, scores = self.backend.search_batch(self.encode_batch(texts), k)
+        return [
+            [(self.names[i], float(score)) for i, score in zip(row, row_scores)]
+            for row, row_scores in zip(indices, scores)
+        ]
+
+
+class PhoneticIndex:
+    """Metaphone code of each name's first token -> rows with that code.
+
+    Persisted as JSON under the same players-file key as the embeddings, so
+    the phonetic fallback is a dictionary lookup instead of a metaphone call
+    per name.
+    """
+
+    def __init__(self, names, codes):
+        self.names = names
+        self.codes = codes
+
+    @classmethod
+    def open(cls, names=None, path=PLAYERS_PATH, index_dir=INDEX_DIR):
+        import jellyfish  # type: ignore
+
+        if names is None:
+            names = load_names(path)
+        codes_path = _index_path(index_dir, "phonetic", file_digest(path), "json")
+
+        if os.path.exists(codes_path):
+            with open(codes_path, encoding="utf-8") as f:
+                codes = json.load(f)
+        else:
+            codes = {}
+            for i, name in enumerate(names):
+                parts = name.split()
+                if parts:
+                    codes.setdefault(jellyfish.metaphone(parts[0]), []).append(i)
+            os.makedirs(index_dir, exist_ok=True)
+            tmp = f"{codes_path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(codes, f)
+            os.replace(tmp, codes_path)
+            _remove_stale(codes_path)
+
+        return cls(names, codes)
+
+    def lookup(self, text, k=5):
+        """Names sharing the query's first-token metaphone, best first.
+
+        Candidates are ranked by Jaro-Winkler similarity of the full names.
+        """
+        import jellyfish  # type: ignore
+
+        parts = text.split()
+        if not parts:
+            return []
+        rows = self.codes.get(jellyfish.metaphone(parts[0]), [])
+        scored = [
+            (self.names[i], jellyfish.jaro_winkler_similarity(text, self.names[i]))
+            for i in rows
+        ]
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:k]
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def _fold(text):
+    """Strip accents: "mbappé" -> "mbappe"."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def _tokens(text):
+    """Accent-folded words of ``text``, hyphenated ones also split up."""
+    words = _fold(text).split()
+    return words + [part for word in words if "-" in word for part in word.split("-")]
+
+
+class TrigramIndex:
+    """Inverted indexes from name tokens and character trigrams to rows.
+
+    Cheap enough to build on every start (no model, no disk artefact). A
+    query whose tokens all appear as whole tokens in some names (e.g. a
+    bare surname like "salah") is answered from the token postings; anything
+    else is scored by trigram Dice similarity, which absorbs typos.
+
+    Several names sharing the query's tokens are told apart without the
+    model: names whose surname (last word) is the query's last token come
+    first, then names with a current league (``in_league``, aligned with
+    ``names``), then earlier names. players_data.json is sorted by Understat
+    ID, so that last step prefers the player Understat has tracked longer.
+    """
+
+    def __init__(self, names, in_league=None):
+        self.names = names
+        self.in_league = (
+            np.zeros(len(names), dtype=bool)
+            if in_league is None
+            else np.asarray(in_league, dtype=bool)
+        )
+        self.tokens = {}
+        self.surnames = []
+        grams = {}
+        gram_counts = np.zeros(len(names), dtype=np.int32)
+        for i, name in enumerate(names):
+            for token in set(_tokens(name)):
+                self.tokens.setdefault(token, []).append(i)
+            self.surnames.append(set(_tokens(name.split()[-1])) if name else set())
+            name_grams = _trigrams(name)
+            gram_counts[i] = len(name_grams)
+            for gram in name_grams:
+                grams.setdefault(gram, []).append(i)
+        self.grams = {g: np.array(rows, dtype=np.int32) for g, rows in grams.items()}
+        self.gram_counts = gram_counts
+
+    def dice(self, text, rows=None):
+        query_grams = _trigrams(text)
+        postings = [self.grams[g] for g in query_grams if g in self.grams]
+        shared = np.zeros(len(self.names), dtype=np.int32)
+        if postings:
+            shared = np.bincount(np.concatenate(postings), minlength=len(self.names))
+        scores = 2.0 * shared / (len(query_grams) + self.gram_counts)
+        return scores if rows is None else scores[rows]
+
+    def lookup(self, text, k=5, threshold=0.6, margin=0.1):
+        """Return ``(candidates, confident)`` with candidates as (name, score).
+
+        ``confident`` is True when the best candidate is unambiguous enough
+        to skip the transformer.
+        """
+        parts = _fold(text).split()
+        if not parts:
+            return [], False
+
+        rows = None
+        for token in parts:
+            token_rows = set(self.tokens.get(token, ()))
+            rows = token_rows if rows is None else rows & token_rows
+            if not rows:
+                break
+
+        if rows:
+            # A token hit is settled by the tie-breaks in the class
+            # docstring; the model has nothing more to go on for a bare
+            # "salah" than these.
+            surname = parts[-1]
+            ranked = sorted(
+                rows,
+                key=lambda row: (
+                    surname not in self.surnames[row],
+                    not self.in_league[row],
+                    row,
+                ),
+            )[:k]
+            scores = self.dice(text, np.array(ranked, dtype=np.int64))
+            candidates = [
+                (self.names[row], float(score)) for row, score in zip(ranked, scores)
+            ]
+            return candidates, True
+
+        top, scores = _top_k(self.dice(text), k)
+        candidates = [(self.names[i], float(score)) for i, score in zip(top, scores)]
+        runner_up = candidates[1][1] if len(candidates) > 1 else 0.0
+        confident = (
+            candidates[0][1] >= threshold and candidates[0][1] - runner_up >= margin
+        )
+        return candidates, confident
+
+
+def _has_weights(model_dir):
+    return any(
+        os.path.exists(os.path.join(model_dir, weights))
+        for weights in ("model.safetensors", "pytorch_model.bin")
+    )
+
+
+def load_model(mode="fp32"):
+    """Load the sentence transformer for CPU inference.
+
+    The bundled ``models/all-MiniLM-L6-v2`` directory is preferred over the
+    hub download; it is only used when its weights file is present, and the
+    source picked is logged. ``mode="int8"`` applies PyTorch dynamic int8 quantization
+    to the linear layers; ``mode="onnx"`` runs the model through ONNX
+    Runtime (``pip install "sentence-transformers[onnx]"``).
+    """
+    from sentence_transformers import SentenceTransformer  # type: ignore
+
+    if mode not in MODEL_MODES:
+        raise ValueError(f"Unknown model mode {mode!r}, expected one of {MODEL_MODES}")
+    if _has_weights(MODEL_DIR):
+        source = MODEL_DIR
+        logger.info("Loading %s (%s) from %s", MODEL_NAME, mode, MODEL_DIR)
+    else:
+        source = MODEL_NAME
+        logger.warning(
+            "No weights in %s, loading %s (%s) from the Hugging Face hub",
+            MODEL_DIR,
+            MODEL_NAME,
+            mode,
+        )
+
+    if mode == "onnx":
+        return SentenceTransformer(source, device="cpu", backend="onnx")
+
+    model = SentenceTransformer(source, device="cpu")
+    if mode == "int8":
+        import torch  # type: ignore
+
+        model = torch.quantization.quantize_dynamic(
+            model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+    return model
+
+
+def check_agreement(mode, names=None, chunk=1024):
+    """Fraction of queries whose top-1 name under ``mode`` matches fp32.
+
+    Every name is used as a query, both in full and as its last token only
+    (the "salah" case), each model scoring against its own name matrix.
+    """
+    if names is None:
+        names = load_names()
+    surnames = [name.split()[-1] for name in names if name.split()]
+
+    def top1(model, queries, matrix):
+        best = []
+        for i in range(0, len(queries), chunk):
+            encoded = model.encode(
+                queries[i : i + chunk],
+                batch_size=256,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+            )
+            best.append((encoded @ matrix.T).argmax(axis=1))
+        return np.concatenate(best)
+
+    results = {}
+    models = {"fp32": load_model("fp32"), mode: load_model(mode)}
+    matrices = {
+        key: m.encode(
+            names, batch_size=256, convert_to_numpy=True, normalize_embeddings=True
+        )
+        for key, m in models.items()
+    }
+    for label, queries in (("full names", names), ("surnames", surnames)):
+        reference = top1(models["fp32"], queries, matrices["fp32"])
+        candidate = top1(models[mode], queries, matrices[mode])
+        # Compare resolved names, not rows, so duplicate names don't count.
+        agree = sum(names[a] == names[b] for a, b in zip(reference, candidate)) / len(
+            queries
+        )
+        results[label] = agree
+    return results
+
+
+class Matcher:
+    """Resolve a free-text (lower-cased) query to one of ``names``.
+
+    Exact names are returned straight away. With ``engine="ngram"`` the
+    trigram index answers next and the transformer is only loaded when it
+    has no confident answer; ``engine="transformer"`` goes straight to the
+    embedding search. Either way a weak embedding match falls back to the
+    phonetic index. ``model_mode`` is passed to ``load_model`` and
+    ``in_league`` to ``TrigramIndex``.
+    """
+
+    ENGINES = ("ngram", "transformer")
+
+    def __init__(
+        self,
+        names,
+        path=PLAYERS_PATH,
+        index_dir=INDEX_DIR,
+        engine="ngram",
+        backend="brute",
+        model_mode="fp32",
+        in_league=None,
+    ):
+        if engine not in self.ENGINES:
+            raise ValueError(
+                f"Unknown matching engine {engine!r}, expected one of {self.ENGINES}"
+            )
+        self.names = names
+        self.exact = set(names)
+        self.path = path
+        self.index_dir = index_dir
+        self.engine = engine
+        self.backend = backend
+        self.model_mode = model_mode
+        self.trigram_index = (
+            TrigramIndex(names, in_league) if engine == "ngram" else None
+        )
+        self._name_index = None
+        self._phonetic_index = None
+
+    @property
+    def name_index(self):
+        if self._name_index is None:
+            self._name_index = NameIndex.open(
+                load_model(self.model_mode),
+                self.names,
+                path=self.path,
+                index_dir=self.index_dir,
+                backend=self.backend,
+                model_key=f"{MODEL_NAME}-{self.model_mode}",
+            )
+        return self._name_index
+
+    @property
+    def phonetic_index(self):
+        if self._phonetic_index is None:
+            self._phonetic_index = PhoneticIndex.open(
+                self.names, path=self.path, index_dir=self.index_dir
+            )
+        return self._phonetic_index
+
+    def match(self, text):
+        if text in self.exact:
+            return text
+
+        if self.trigram_index is not None:
+            candidates, confident = self.trigram_index.lookup(text)
+            if confident:
+                return candidates[0][0]
+
+        best_match, best_score = self.name_index.search(text, k=1)[0]
+
+        if best_score < 0.8:
+            candidates = self.phonetic_index.lookup(text)
+            if candidates:
+                return candidates[0][0]
+
+        return best_match
+
+    def resolve_batch(self, queries, k=5):
+        """Top-k ``(name, score)`` candidates for each free-text query.
+
+        Queries are lower-cased and stripped, then resolved together through
+        ``NameIndex.search_batch``.
+        """
+        return self.name_index.search_batch(
+            [str(query).strip().lower() for query in queries], k
+        )
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(
+        description="Check that a quantized model resolves names like fp32."
+    )
+    parser.add_argument("mode", choices=[m for m in MODEL_MODES if m != "fp32"])
+    parser.add_argument("--min-agreement", type=float, default=0.99)
+    args = parser.parse_args()
+
+    results = check_agreement(args.mode)
+    for label, agree in results.items():
+        print(f"{label}: {agree:.2%} top-1 agreement with fp32")
+    sys.exit(0 if results["full names"] >= args.min_agreement else 1)
@@ -0,0 +1,163 @@
+"""Columnar, memory-mapped copy of players/players_data.json.
+
+The JSON file stays the source of truth; this module compiles it into one
+.npy file per column under players/.index/table-<digest>/ so both front ends
+can open it without parsing 14k JSON objects. League names are interned into
+small integer codes, and the lower-cased names and Understat league keys are
+stored precomputed.
+
+    python -m shotmap.players_table   # build (or rebuild) the table
+"""
+
+import json
+import os
+import shutil
+
+import numpy as np
+
+from shotmap.matcher import INDEX_DIR, PLAYERS_PATH, file_digest
+
+COLUMNS = ("player_id", "name", "name_lower", "league_code", "seasons")
+NO_LEAGUE = -1
+
+
+def league_key(league):
+    """'La liga' -> 'La_liga', the code Understat uses in its league URLs."""
+    return league.replace(" ", "_")
+
+
+def _table_dir(index_dir, digest):
+    return os.path.join(index_dir, f"table-{digest}")
+
+
+def _remove_stale(index_dir, keep):
+    for entry in os.listdir(index_dir):
+        if entry.startswith("table-") and entry != os.path.basename(keep):
+            shutil.rmtree(os.path.join(index_dir, entry), ignore_errors=True)
+
+
+def build(path=PLAYERS_PATH, index_dir=INDEX_DIR):
+    """Compile the JSON file into a table directory and return its path."""
+    with open(path, encoding="utf-8") as p:
+        loaded = json.load(p)
+
+    league_names = sorted({item["league"] for item in loaded if item.get("league")})
+    codes = {league: code for code, league in enumerate(league_names)}
+
+    names = [str(item.get("name") or "") for item in loaded]
+    columns = {
+        "player_id": np.array([int(item["player_id"]) for item in loaded], np.int32),
+        "name": np.array(names, dtype=str),
+        "name_lower": np.array([name.lower() for name in names], dtype=str),
+        "league_code": np.array(
+            [codes.get(item.get("league"), NO_LEAGUE) for item in loaded], np.int8
+        ),
+        "seasons": np.array(
+            [",".join(item.get("seasons") or ()) for item in loaded], dtype=str
+        ),
+    }
+
+    digest = file_digest(path)
+    os.makedirs(index_dir, exist_ok=True)
+    target = _table_dir(index_dir, digest)
+    tmp = f"{target}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for column, array in columns.items():
+        np.save(os.path.join(tmp, f"{column}.npy"), array)
+    with open(os.path.join(tmp, "leagues.json"), "w", encoding="utf-8") as f:
+        json.dump([{"name": name, "key": league_key(name)} for name in league_names], f)
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(tmp, target)
+    _remove_stale(index_dir, target)
+    return target
+
+
+class PlayersTable:
+    """Column arrays for every player, in the order of the JSON file."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        for column in COLUMNS:
+            setattr(
+                self,
+                column,
+                np.load(os.path.join(directory, f"{column}.npy"), mmap_mode="r"),
+            )
+        with open(os.path.join(directory, "leagues.json"), encoding="utf-8") as f:
+            leagues = json.load(f)
+        self.league_names = [league["name"] for league in leagues]
+        self.league_keys = [league["key"] for league in leagues]
+
+    @classmethod
+    def open(cls, path=PLAYERS_PATH, index_dir=INDEX_DIR):
+        """Open the table for the current JSON file, building it if stale."""
+        directory = _table_dir(index_dir, file_digest(path))
+        if not os.path.isdir(directory):
+            directory = build(path, index_dir)
+        return cls(directory)
+
+    def __len__(self):
+        return len(self.player_id)
+
+    def names(self):
+        """Lower-cased names of every named player, as matcher candidates."""
+        return [name for name in self.name_lower.tolist() if name]
+
+    def in_league(self):
+        """Whether each of names() has a current league, aligned with it."""
+        named = np.asarray(self.name_lower) != ""
+        return np.asarray(self.league_code)[named] != NO_LEAGUE
+
+    def rows_by_name(self):
+        """Map each lower-cased name to the first row that carries it."""
+        rows = {}
+        for row, name in enumerate(self.name_lower.tolist()):
+            if name:
+                rows.setdefault(name, row)
+        return rows
+
+    def record(self, row):
+        code = int(self.league_code[row])
+        seasons = str(self.seasons[row])
+        return {
+            "player_id": str(self.player_id[row]),
+            "name": str(self.name[row]),
+            "league": self.league_names[code] if code != NO_LEAGUE else None,
+            "league_key": self.league_keys[code] if code != NO_LEAGUE else None,
+            "seasons": seasons.split(",") if seasons else None,
+        }
+
+    def to_frame(self):
+        """DataFrame with the columns of the JSON records, plus league_key."""
+        import pandas as pd
+
+        codes = np.asarray(self.league_code)
+        known = codes != NO_LEAGUE
+        league_names = np.array(self.league_names + [None], dtype=object)
+        league_keys = np.array(self.league_keys + [None], dtype=object)
+        lookup = np.where(known, codes, len(self.league_names))
+        known_names = np.asarray(self.name) != ""
+        df = pd.DataFrame(
+            {
+                "player_id": self.player_id.astype(str),
+                "name": np.where(
+                    known_names, np.asarray(self.name, dtype=object), None
+                ),
+                "league": league_names[lookup],
+                "league_key": league_keys[lookup],
+            }
+        )
+        if (np.asarray(self.seasons) != "").any():
+            df["seasons"] = [
+                seasons.split(",") if seasons else None
+                for seasons in self.seasons.tolist()
+            ]
+        return df
+
+
+if __name__ == "__main__":
+    table = PlayersTable(build())
+    print(
+        f"{len(table)} players, {len(table.league_names)} leagues -> {table.directory}"
+    )
@@ -0,0 +1,389 @@
+"""Shot map drawing shared by shot.py and app.py.
+
+A shot map is a static template (legend, pitch, stat captions and credit
+line, identical on every map) plus the player's own text and shots.
+``render_image`` rasterises the template once per figure size and DPI, on
+a canvas spanning its tight bounding box the way
+``savefig(bbox_inches="tight")`` would, and only draws the player layer on
+top of that image. A player layer that reaches past the template's bbox (a
+long subtitle, say) is drawn with the template by ``render_shot_map``.
+"""
+
+import functools
+import io
+import os
+import threading
+
+import numpy as np
+
+BACKGROUND_COLOR = "#484e48"
+PITCH_COLOR = "#2c932f"
+FIGSIZE = (9, 13)
+FONT_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "lato",
+    "Lato-Regular.ttf",
+)
+# Padding kept around the cropped image, as savefig's pad_inches.
+PAD_INCHES = 0.1
+CREDIT = (
+    "Viz by @BetterThanMario | Created using https://shotmap.streamlit.app"
+    " | Data: understat.com"
+)
+# Where the credit line starts, as a fraction of the footer's width.
+CREDIT_X = 0.29
+
+HEADER_RECT = [0, 0.7, 1, 0.2]
+PITCH_RECT = [0.05, 0.3, 0.72, 0.45]
+FOOTER_RECT = [0, 0.2, 1, 0.05]
+PANEL_RECTS = (HEADER_RECT, PITCH_RECT, FOOTER_RECT)
+
+MARKERS = ("o", "s", "^")
+
+# (x, label, fontsize, marker x, colour, marker) of the outcome key.
+OUTCOME_KEY = [
+    (0.096, "- Shot Saved", 10, 0.08, "yellow", "o"),
+    (0.216, "- Blocked/Off Target", 10, 0.2, BACKGROUND_COLOR, "o"),
+    (0.396, "- Goal", 11, 0.38, "red", "o"),
+    (0.486, "- Penalty Scored", 11, 0.47, "blue", "s"),
+    (0.646, "- Penalty Missed", 11, 0.63, "violet", "s"),
+    (0.806, "- Freekick Scored", 11, 0.79, "turquoise", "^"),
+]
+# (stat key, caption, caption x/y, value x/y) of the per 90 column.
+PER90_STATS = [
+    ("xg_p90", "xG per 90", (0.83, -0.1), (0.88, -0.23)),
+    ("shots_p90", "Shots per 90", (0.82, -0.51), (0.88, -0.63)),
+    ("npxg_p90", "npxG per 90", (0.82, -0.9), (0.88, -1.03)),
+    ("xgi_p90", "xGI per 90", (0.83, -1.3), (0.88, -1.43)),
+]
+# (stat key, caption, caption x, value x, value format) of the totals row.
+TOTAL_STATS = [
+    ("shots", "Total Shots", 0.06, 0.12, "{}"),
+    ("goals", "Total Goals", 0.25, 0.32, "{}"),
+    ("xg", "Total xG", 0.44, 0.48, "{:.2f}"),
+    ("xg_per_shot", "xG per Shot", 0.6, 0.66, "{:.2f}"),
+]
+
+
+def shot_styles(df, miss_color):
+    """Colour, marker and size of every shot, as arrays aligned with ``df``.
+
+    Penalties are squares (blue scored, violet missed), free kicks are
+    triangles (turquoise when scored), and everything else is a circle:
+    yellow when saved, red when scored and ``miss_color`` otherwise. Sizes
+    scale with xG.
+    """
+    result = df["result"].to_numpy()
+    situation = df["situation"].to_numpy()
+    goal = result == "Goal"
+    penalty = situation == "Penalty"
+    freekick = situation == "Freekick"
+
+    colors = np.select(
+        [
+            goal & penalty,
+            ~goal & penalty,
+            goal & freekick,
+            result == "SavedShot",
+            goal,
+        ],
+        ["blue", "violet", "turquoise", "yellow", "red"],
+        default=miss_color,
+    )
+    markers = np.select([penalty, freekick], ["s", "^"], default="o")
+    sizes = 400 * df["xG"].to_numpy(dtype=float)
+    return colors, markers, sizes
+
+
+def scatter_shots(pitch, ax, df, miss_color):
+    """Draw every shot with one scatter call per marker shape."""
+    colors, markers, sizes = shot_styles(df, miss_color)
+    x = df["X"].to_numpy(dtype=float)
+    y = df["Y"].to_numpy(dtype=float)
+    for marker in MARKERS:
+        rows = markers == marker
+        if not rows.any():
+            continue
+        pitch.scatter(
+            x[rows],
+            y[rows],
+            s=sizes[rows],
+            c=colors[rows],
+            marker=marker,
+            ax=ax,
+            alpha=0.6,
+            linewidth=0.8,
+            edgecolor="white",
+        )
+
+
+@functools.lru_cache(maxsize=None)
+def font_properties(path=FONT_PATH):
+    import matplotlib.font_manager as fm  # type: ignore
+
+    return fm.FontProperties(fname=path)
+
+
+def _panel(fig, rect, facecolor):
+    ax = fig.add_axes(rect)
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+    ax.set_xticks([])
+    ax.set_yticks([])
+    ax.set_facecolor(facecolor)
+    return ax
+
+
+def _pitch():
+    from mplsoccer import VerticalPitch  # type: ignore
+
+    return VerticalPitch(
+        pitch_type="opta",
+        half=True,
+        pitch_color=PITCH_COLOR,
+        pad_bottom=0.5,
+        line_color="white",
+        linewidth=0.75,
+        axis=True,
+        label=True,
+    )
+
+
+def _caption(ax, x, y, s, fontsize, **kwargs):
+    kwargs.setdefault("fontweight", "bold")
+    kwargs.setdefault("ha", "left")
+    ax.text(
+        x=x,
+        y=y,
+        s=s,
+        fontsize=fontsize,
+        fontproperties=font_properties(),
+        color="white",
+        **kwargs,
+    )
+
+
+def draw_template(fig, credit=CREDIT, rects=PANEL_RECTS, credit_x=CREDIT_X):
+    """Draw the static layer; returns the header, pitch and footer axes.
+
+    ``rects`` places the three panels, in figure fractions, and ``credit_x``
+    the start of the credit line, in footer fractions.
+    """
+    header_rect, pitch_rect, footer_rect = rects
+    fig.patch.set_facecolor(BACKGROUND_COLOR)
+
+    header = _panel(fig, header_rect, BACKGROUND_COLOR)
+    header.set_xlim(0, 1)
+    header.set_ylim(0, 1)
+    _caption(header, 0.27, 0.5, "Low Quality Chance", 12, ha="center")
+    for x, size in zip((0.37, 0.42, 0.48, 0.54, 0.61), (100, 200, 300, 400, 500)):
+        header.scatter(
+            x=x,
+            y=0.53,
+            s=size,
+            color=BACKGROUND_COLOR,
+            edgecolor="white",
+            linewidth=0.8,
+        )
+    _caption(header, 0.723, 0.5, "High Quality Chance", 12, ha="center")
+    for text_x, label, fontsize, marker_x, color, marker in OUTCOME_KEY:
+        _caption(header, text_x, 0.286, label, fontsize, fontweight="normal")
+        header.scatter(
+            x=marker_x,
+            y=0.3,
+            s=150,
+            color=color,
+            marker=marker,
+            edgecolor="white",
+            linewidth=0.8,
+            alpha=0.7,
+        )
+    for _, caption, (x, y), _ in PER90_STATS:
+        _caption(header, x, y, caption, 20)
+
+    pitch_ax = _panel(fig, pitch_rect, PITCH_COLOR)
+    pitch = _pitch()
+    pitch.draw(ax=pitch_ax)
+
+    footer = _panel(fig, footer_rect, BACKGROUND_COLOR)
+    for _, caption, x, _, _ in TOTAL_STATS:
+        _caption(footer, x, 1.8, caption, 20)
+    footer.text(x=credit_x, y=0.05, s=credit, fontsize=10, color="white", alpha=0.7)
+    return header, pitch_ax, footer, pitch
+
+
+def draw_player(header, pitch_ax, footer, pitch, df, title, subtitle, stats):
+    """Draw the player layer: titles, stat values and the shots themselves.
+
+    ``stats`` maps the keys of PER90_STATS and TOTAL_STATS to numbers.
+    """
+    _caption(header, 0.5, 0.85, title, 25, ha="center")
+    _caption(header, 0.5, 0.71, subtitle, 13, ha="center")
+    for key, _, _, (x, y) in PER90_STATS:
+        _caption(header, x, y, f"{stats[key]:.2f}", 18)
+    scatter_shots(pitch, pitch_ax, df, PITCH_COLOR)
+    for key, _, _, x, fmt in TOTAL_STATS:
+        _caption(footer, x, 1.4, fmt.format(stats[key]), 18)
+
+
+def _rects(boxes, bbox):
+    """Figure-fraction rects of ``boxes`` on a figure spanning ``bbox``.
+
+    Both are in inches of the unshifted FIGSIZE figure, so the panels keep
+    their size and land where savefig's bbox_inches would put them.
+    """
+    return [
+        [
+            (box.x0 - bbox.x0) / bbox.width,
+            (box.y0 - bbox.y0) / bbox.height,
+            box.width / bbox.width,
+            box.height / bbox.height,
+        ]
+        for box in boxes
+    ]
+
+
+class FigureTemplate:
+    """The static layer rendered once, as an RGBA image, at one size and DPI.
+
+    ``content`` is the template's tight bounding box and ``bbox`` that box
+    padded by PAD_INCHES, both in inches of the ``figsize`` figure; the
+    image covers ``bbox``. ``background`` is the Agg blitting region of
+    that image, and ``rects`` and ``limits`` the positions and data limits
+    of the three panels on it, so the player layer can be drawn on bare
+    axes that line up with the image exactly.
+    """
+
+    def __init__(self, figsize, dpi, credit=CREDIT, credit_x=CREDIT_X):
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+        from matplotlib.transforms import Bbox
+
+        # Lay the template out at its own size to measure it ...
+        fig = Figure(figsize=figsize, dpi=dpi)
+        renderer = FigureCanvasAgg(fig).get_renderer()
+        axes = draw_template(fig, credit, credit_x=credit_x)[:3]
+        self.content = fig.get_tightbbox(renderer).frozen()
+        self.bbox = self.content.padded(PAD_INCHES)
+        width, height = figsize
+        boxes = [
+            Bbox.from_bounds(
+                box.x0 * width, box.y0 * height, box.width * width, box.height * height
+            )
+            for box in (ax.get_position(original=False) for ax in axes)
+        ]
+
+        # ... then render it on a figure spanning its padded tight bbox.
+        fig = Figure(figsize=self.bbox.size, dpi=dpi)
+        canvas = FigureCanvasAgg(fig)
+        axes = draw_template(fig, credit, _rects(boxes, self.bbox), credit_x)[:3]
+        canvas.draw()
+        self.figsize = figsize
+        self.dpi = dpi
+        self.image = np.asarray(canvas.buffer_rgba()).copy()
+        self.background = canvas.copy_from_bbox(fig.bbox)
+        self.rects = [ax.get_position(original=False).bounds for ax in axes]
+        self.limits = [(ax.get_xlim(), ax.get_ylim()) for ax in axes]
+
+    def player_layer(self, df, title, subtitle, stats):
+        """A Figure holding only the player layer, on bare aligned axes."""
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        fig = Figure(figsize=self.bbox.size, dpi=self.dpi)
+        FigureCanvasAgg(fig)
+        fig.patch.set_visible(False)
+        overlays = []
+        for rect, (xlim, ylim) in zip(self.rects, self.limits):
+            ax = fig.add_axes(rect)
+            ax.set_axis_off()
+            ax.set_xlim(xlim)
+            ax.set_ylim(ylim)
+            overlays.append(ax)
+        draw_player(*overlays, _pitch(), df, title, subtitle, stats)
+        return fig
+
+    def contains(self, fig):
+        """Whether player layer ``fig`` lies inside the template's tight bbox.
+
+        If it does not, savefig would grow the bbox to take it in and the
+        template image is too small to go under it.
+        """
+        extent = fig.get_tightbbox(fig.canvas.get_renderer()).frozen()
+        extent = extent.translated(self.bbox.x0, self.bbox.y0)
+        # The panels themselves come back a rounding error off the template's.
+        content = self.content.padded(1e-9)
+        return bool(
+            content.x0 <= extent.x0
+            and content.y0 <= extent.y0
+            and extent.x1 <= content.x1
+            and extent.y1 <= content.y1
+        )
+
+
+_templates_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=8)
+def _cached_template(figsize, dpi, credit, credit_x):
+    return FigureTemplate(figsize, dpi, credit, credit_x)
+
+
+def get_template(figsize=FIGSIZE, dpi=100, credit=CREDIT, credit_x=CREDIT_X):
+    with _templates_lock:
+        return _cached_template(tuple(figsize), dpi, credit, credit_x)
+
+
+def render_shot_map(
+    df, title, subtitle, stats, dpi=100, credit=CREDIT, credit_x=CREDIT_X
+):
+    """The whole shot map drawn on one FIGSIZE Figure.
+
+    Save it with ``bbox_inches="tight"``; ``render_image`` produces the
+    same image faster when only the encoded bytes are needed.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=FIGSIZE, dpi=dpi)
+    FigureCanvasAgg(fig)
+    draw_player(
+        *draw_template(fig, credit, credit_x=credit_x), df, title, subtitle, stats
+    )
+    return fig
+
+
+def render_image(
+    df,
+    title,
+    subtitle,
+    stats,
+    dpi=100,
+    format="png",
+    credit=CREDIT,
+    credit_x=CREDIT_X,
+):
+    """The shot map as encoded image bytes (any format Pillow can write).
+
+    The template is blitted into the Agg buffer and only the player layer is
+    drawn over it. A player layer reaching past the template's bbox falls
+    back to saving render_shot_map with ``bbox_inches="tight"``.
+    """
+    import matplotlib.image as mpimg
+
+    template = get_template(FIGSIZE, dpi, credit, credit_x)
+    fig = template.player_layer(df, title, subtitle, stats)
+    buf = io.BytesIO()
+    if not template.contains(fig):
+        fig = render_shot_map(df, title, subtitle, stats, dpi, credit, credit_x)
+        fig.savefig(
+            buf, format=format, dpi=dpi, bbox_inches="tight", pad_inches=PAD_INCHES
+        )
+        return buf.getvalue()
+
+    renderer = fig.canvas.get_renderer()
+    renderer.restore_region(template.background)
+    for ax in fig.axes:
+        ax.draw(renderer)
+    mpimg.imsave(buf, np.asarray(fig.canvas.buffer_rgba()), format=format, dpi=dpi)
+    return buf.getvalue()
@@ -0,0 +1,179 @@
+"""Local stand-in for the Understat JSON API, for load and integration tests.
+
+Serves /getPlayerData/<id> and /getLeagueData/<league>/<season> from a
+snapshot bundle (see SHOTMAP_SNAPSHOT in shotmap.understat) or a fixture
+directory laid out the same way (getPlayerData/1250.json, ...), with
+injected latency, server errors and 429s:
+
+    python -m shotmap.standin --snapshot bundle.zip --latency 0.2 \\
+        --error-rate 0.05 --throttle-rate 0.05
+    SHOTMAP_UNDERSTAT_URL=http://127.0.0.1:8765 python shot.py
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from shotmap.understat import Snapshot
+
+ROUTES = re.compile(r"^/(getPlayerData/\d+|getLeagueData/\w+/\d{4})/?$")
+
+
+class FixtureDir:
+    """Directory of <path>.json payloads, read on every request."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self, path):
+        try:
+            with open(
+                os.path.join(self.path, path.lstrip("/") + ".json"), encoding="utf-8"
+            ) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address,
+        source,
+        latency=0.0,
+        jitter=0.5,
+        error_rate=0.0,
+        throttle_rate=0.0,
+        retry_after=1,
+        seed=None,
+    ):
+        super().__init__(address, StandInHandler)
+        self.source = source
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+        self.stats = Counter()
+        self.stats_lock = threading.Lock()
+
+    def roll(self):
+        with self.random_lock:
+            return self.random.random()
+
+    def delay(self):
+        spread = self.latency * self.jitter
+        with self.random_lock:
+            return max(0.0, self.random.uniform(-spread, spread) + self.latency)
+
+    def count(self, key):
+        with self.stats_lock:
+            self.stats[key] += 1
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    def _send(self, status, body=b"", headers=()):
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        server.count("requests")
+        if server.latency:
+            time.sleep(server.delay())
+
+        roll = server.roll()
+        if roll < server.throttle_rate:
+            server.count("429")
+            self._send(429, headers=[("Retry-After", str(server.retry_after))])
+            return
+        if roll < server.throttle_rate + server.error_rate:
+            server.count("5xx")
+            self._send(503)
+            return
+
+        match = ROUTES.match(self.path.split("?", 1)[0])
+        data = server.source.load("/" + match.group(1)) if match else None
+        if data is None:
+            server.count("404")
+            self._send(404)
+            return
+
+        body = json.dumps(data, separators=(",", ":")).encode()
+        etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+        if self.headers.get("If-None-Match") == etag:
+            server.count("304")
+            self._send(304, headers=[("ETag", etag)])
+            return
+        server.count("200")
+        self._send(200, body, [("Content-Type", "application/json"), ("ETag", etag)])
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local Understat stand-in server.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--snapshot", help="snapshot bundle to serve")
+    source.add_argument("--fixtures", help="fixture directory to serve")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="mean delay per request (s)"
+    )
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        default=0.5,
+        help="latency spread, as a fraction of --latency",
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="fraction of 503 responses"
+    )
+    parser.add_argument(
+        "--throttle-rate", type=float, default=0.0, help="fraction of 429 responses"
+    )
+    parser.add_argument(
+        "--retry-after", type=int, default=1, help="Retry-After sent with 429s (s)"
+    )
+    parser.add_argument("--seed", type=int, help="seed for the injected faults")
+    args = parser.parse_args(argv)
+
+    server = StandInServer(
+        (args.host, args.port),
+        Snapshot(args.snapshot) if args.snapshot else FixtureDir(args.fixtures),
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+    print(f"Serving Understat stand-in on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(", ".join(f"{key}: {n}" for key, n in sorted(server.stats.items())))
+
+
+if __name__ == "__main__":
+    main()
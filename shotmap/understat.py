@@ -0,0 +1,419 @@
+"""Shared Understat client used by shot.py and app.py.
+
+Responses are kept in a persistent on-disk cache, requests go through one
+keep-alive session with timeouts, jittered exponential backoff and a
+token-bucket rate limit, and concurrent requests for the same endpoint
+share a single in-flight fetch.
+
+Setting SHOTMAP_SNAPSHOT to a .zip path switches on snapshot mode:
+SHOTMAP_SNAPSHOT_MODE=record saves every payload the code asks for into that
+bundle, and SHOTMAP_SNAPSHOT_MODE=replay (the default) serves payloads from
+it alone, with no network or cache access.
+"""
+
+import datetime
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import zipfile
+import zlib
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import zstandard  # type: ignore
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Point at a stand-in server (python -m shotmap.standin) for load tests.
+BASE_URL = os.environ.get("SHOTMAP_UNDERSTAT_URL", "https://understat.com").rstrip("/")
+CACHE_DIR = os.environ.get("SHOTMAP_CACHE_DIR", ".cache")
+HEADERS = {"User-Agent": "Mozilla/5.0", "X-Requested-With": "XMLHttpRequest"}
+# Upper bound on parallel requests, and the size of the keep-alive pool.
+MAX_CONCURRENCY = 8
+
+# (connect, read) timeouts in seconds.
+TIMEOUT = (5, 20)
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 20.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Sustained requests per second, and how many may burst above that.
+RATE_LIMIT = 4.0
+RATE_BURST = 8
+SNAPSHOT_PATH = os.environ.get("SHOTMAP_SNAPSHOT")
+SNAPSHOT_MODE = os.environ.get("SHOTMAP_SNAPSHOT_MODE", "replay")
+SNAPSHOT_MODES = ("record", "replay")
+
+# Seconds before a cached response is revalidated; None means never.
+PLAYER_TTL = 15 * 60
+CURRENT_SEASON_TTL = 10 * 60
+PAST_SEASON_TTL = None
+
+
+def current_season(today=None):
+    """Starting year of the season in progress (seasons start in July)."""
+    today = today or datetime.date.today()
+    return today.year if today.month >= 7 else today.year - 1
+
+
+def league_ttl(season):
+    if int(season) < current_season():
+        return PAST_SEASON_TTL
+    return CURRENT_SEASON_TTL
+
+
+def _compress(data):
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=3).compress(data)
+    return "zlib", zlib.compress(data, 6)
+
+
+def _decompress(codec, blob):
+    if codec == "zstd":
+        if zstandard is None:
+            raise ImportError("Cached entry is zstd-compressed: pip install zstandard")
+        return zstandard.ZstdDecompressor().decompress(blob)
+    return zlib.decompress(blob)
+
+
+class ResponseCache:
+    """SQLite store of compressed JSON bodies with their validators."""
+
+    def __init__(self, path=None):
+        path = path or os.path.join(CACHE_DIR, "understat.sqlite")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                codec TEXT NOT NULL,
+                body BLOB NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                ttl REAL
+            )
+            """)
+        self.db.commit()
+
+    def load(self, key):
+        with self.lock:
+            return self.db.execute(
+                "SELECT codec, body, etag, last_modified, fetched_at, ttl "
+                "FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+
+    def store(self, key, body, etag, last_modified, ttl):
+        codec, blob = _compress(body)
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, codec, blob, etag, last_modified, time.time(), ttl),
+            )
+            self.db.commit()
+
+    def touch(self, key, ttl):
+        with self.lock:
+            self.db.execute(
+                "UPDATE responses SET fetched_at = ?, ttl = ? WHERE key = ?",
+                (time.time(), ttl, key),
+            )
+            self.db.commit()
+
+
+class Snapshot:
+    """Zip bundle of JSON payloads, one deflated entry per request path.
+
+    Entries are only ever added: recording a path that is already in the
+    bundle keeps the first payload, so delete the bundle to re-record.
+    """
+
+    def __init__(self, path, mode="replay"):
+        if mode not in SNAPSHOT_MODES:
+            raise ValueError(f"Unknown snapshot mode {mode!r}")
+        if mode == "replay" and not os.path.exists(path):
+            raise FileNotFoundError(f"No snapshot bundle at {path}")
+        self.path = path
+        self.mode = mode
+        self.lock = threading.Lock()
+        self.names = set()
+        if os.path.exists(path):
+            with zipfile.ZipFile(path) as bundle:
+                self.names = set(bundle.namelist())
+
+    @staticmethod
+    def _entry(path):
+        return path.lstrip("/") + ".json"
+
+    def load(self, path):
+        name = self._entry(path)
+        if name not in self.names:
+            return None
+        with self.lock, zipfile.ZipFile(self.path) as bundle:
+            return json.loads(bundle.read(name))
+
+    def save(self, path, data):
+        name = self._entry(path)
+        with self.lock:
+            if name in self.names:
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with zipfile.ZipFile(
+                self.path, "a", compression=zipfile.ZIP_DEFLATED, compresslevel=9
+            ) as bundle:
+                bundle.writestr(name, json.dumps(data, separators=(",", ":")))
+            self.names.add(name)
+
+
+class TokenBucket:
+    """Blocking token bucket: ``rate`` tokens per second, at most ``capacity``."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def penalise(self, seconds):
+        """Drain the bucket so nobody sends for ``seconds`` (after a 429)."""
+        with self.lock:
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+def _retry_after(response):
+    value = response.headers.get("Retry-After")
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class UnderstatClient:
+    """Cached, rate-limited, retrying client for the Understat JSON API.
+
+    Fresh cache entries are served without touching the network; stale ones
+    are revalidated with If-None-Match / If-Modified-Since, and are still
+    served if understat.com cannot be reached. ``stats`` counts hits
+    (fresh), misses (full downloads), revalidated (304s), stale (served
+    after a failed request), coalesced (joined an in-flight fetch), retries
+    and errors.
+
+    With a replay ``snapshot`` every payload comes from the bundle (counted
+    as replayed) and nothing else is touched; with a record one, every
+    payload returned is also written to it.
+    """
+
+    def __init__(self, cache=None, session=None, snapshot=None):
+        self.snapshot = snapshot
+        self.replay = snapshot is not None and snapshot.mode == "replay"
+        if cache is None and not self.replay:
+            cache = ResponseCache()
+        self.cache = cache
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MAX_CONCURRENCY)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        self.session = session
+        self.session.headers.update(HEADERS)
+        self.limiter = TokenBucket(RATE_LIMIT, RATE_BURST)
+        self.stats = Counter()
+        self.stats_lock = threading.Lock()
+        self.inflight = {}
+        self.inflight_lock = threading.Lock()
+
+    def _count(self, key):
+        with self.stats_lock:
+            self.stats[key] += 1
+
+    def _request(self, path, headers):
+        """GET with retries; returns the last response, or None."""
+        url = f"{BASE_URL}{path}"
+        for attempt in range(MAX_RETRIES + 1):
+            delay = None
+            self.limiter.acquire()
+            try:
+                r = self.session.get(url, headers=headers, timeout=TIMEOUT)
+                if r.status_code not in RETRY_STATUSES:
+                    return r
+                delay = _retry_after(r)
+                if r.status_code == 429 and delay is not None:
+                    # Pause every caller, not just this one; the limiter
+                    # does the waiting.
+                    self.limiter.penalise(delay)
+                    delay = 0.0
+                reason = f"HTTP {r.status_code}"
+            except (requests.Timeout, requests.ConnectionError) as e:
+                r = None
+                reason = type(e).__name__
+
+            if attempt == MAX_RETRIES:
+                break
+            if delay is None:
+                delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2**attempt))
+            self._count("retries")
+            logger.info("Retrying %s in %.1fs after %s", path, delay, reason)
+            time.sleep(delay)
+
+        logger.warning("Giving up on %s after %s attempts", path, MAX_RETRIES + 1)
+        return r
+
+    def _fetch(self, path, ttl):
+        row = self.cache.load(path)
+        cached = None
+        headers = {}
+        if row is not None:
+            codec, blob, etag, last_modified, fetched_at, row_ttl = row
+            cached = json.loads(_decompress(codec, blob))
+            if row_ttl is None or time.time() - fetched_at < row_ttl:
+                self._count("hits")
+                return cached
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        try:
+            r = self._request(path, headers)
+            if r is not None and r.status_code == 304 and cached is not None:
+                self.cache.touch(path, ttl)
+                self._count("revalidated")
+                return cached
+            if r is not None and r.status_code == 200:
+                data = r.json()
+                self.cache.store(
+                    path,
+                    r.content,
+                    r.headers.get("ETag"),
+                    r.headers.get("Last-Modified"),
+                    ttl,
+                )
+                self._count("misses")
+                return data
+        except (requests.RequestException, ValueError) as e:
+            logger.warning("Request for %s failed: %r", path, e)
+
+        if cached is not None:
+            self._count("stale")
+            return cached
+        self._count("errors")
+        return None
+
+    def get_json(self, path, ttl):
+        """GET ``BASE_URL + path`` as JSON, or None if it can't be had."""
+        with self.inflight_lock:
+            future = self.inflight.get(path)
+            leader = future is None
+            if leader:
+                future = self.inflight[path] = Future()
+
+        if not leader:
+            self._count("coalesced")
+            return future.result()
+
+        try:
+            if self.replay:
+                data = self.snapshot.load(path)
+                if data is None:
+                    logger.warning("%s is not in %s", path, self.snapshot.path)
+                self._count("replayed" if data is not None else "errors")
+            else:
+                data = self._fetch(path, ttl)
+                if self.snapshot is not None and data is not None:
+                    self.snapshot.save(path, data)
+            future.set_result(data)
+            return data
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.inflight_lock:
+                del self.inflight[path]
+
+
+_client = None
+_executor = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            snapshot = None
+            if SNAPSHOT_PATH:
+                snapshot = Snapshot(SNAPSHOT_PATH, SNAPSHOT_MODE)
+            _client = UnderstatClient(snapshot=snapshot)
+        return _client
+
+
+def _pool():
+    global _executor
+    with _client_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=MAX_CONCURRENCY, thread_name_prefix="understat"
+            )
+        return _executor
+
+
+def get_player_data(player_id):
+    return get_client().get_json(f"/getPlayerData/{player_id}", PLAYER_TTL)
+
+
+def get_league_data(league_name, season):
+    return get_client().get_json(
+        f"/getLeagueData/{league_name}/{season}", league_ttl(season)
+    )
+
+
+def get_player_data_async(player_id):
+    """Start fetching a player payload; returns a Future."""
+    return _pool().submit(get_player_data, player_id)
+
+
+def get_league_data_many(league_seasons):
+    """Fetch several (league, season) payloads in parallel, in order.
+
+    All requests share the client's keep-alive pool, so the wall time is
+    roughly that of the slowest one. Don't call this from inside a pool
+    task: the workers would be waiting on themselves.
+    """
+    futures = [
+        _pool().submit(get_league_data, league, season)
+        for league, season in league_seasons
+    ]
+    return [future.result() for future in futures]
+
+
+def cache_stats():
+    client = get_client()
+    with client.stats_lock:
+        return dict(client.stats)
@@ -0,0 +1,309 @@
+"""Local shot warehouse: typed Understat shots in SQLite.
+
+Shots are stored one row each in a WITHOUT ROWID table clustered on
+(season, league, player_id, id), so a season or a season + league query
+reads one contiguous range of the file, and typed columns replace the
+string-valued dicts of the getPlayerData payload. Each stored season also
+keeps the player's ``groups.season`` rows, so the batch renderer can build
+a map from the warehouse without fetching the player. The warehouse is
+filled by a bulk ingest job:
+
+    python -m shotmap.warehouse ingest 2024              # every league
+    python -m shotmap.warehouse ingest 2024 --league EPL
+    python -m shotmap.warehouse summary
+"""
+
+import argparse
+import os
+import sqlite3
+import threading
+import time
+
+from shotmap import leagues, understat
+
+# (column, SQL type, converter applied to the Understat string value)
+COLUMNS = [
+    ("season", "INTEGER NOT NULL", int),
+    ("league", "TEXT NOT NULL", str),
+    ("player_id", "INTEGER NOT NULL", int),
+    ("id", "INTEGER NOT NULL", int),
+    ("minute", "INTEGER", int),
+    ("X", "REAL", float),
+    ("Y", "REAL", float),
+    ("xG", "REAL", float),
+    ("result", "TEXT", str),
+    ("situation", "TEXT", str),
+    ("shotType", "TEXT", str),
+    ("lastAction", "TEXT", str),
+    ("h_a", "TEXT", str),
+    ("match_id", "INTEGER", int),
+    ("h_team", "TEXT", str),
+    ("a_team", "TEXT", str),
+    ("h_goals", "INTEGER", int),
+    ("a_goals", "INTEGER", int),
+    ("date", "TEXT", str),
+    ("player", "TEXT", str),
+    ("player_assisted", "TEXT", str),
+]
+FLOAT_COLUMNS = ("X", "Y", "xG")
+CATEGORY_COLUMNS = ("league", "result", "situation", "shotType", "lastAction", "h_a")
+# groups.season columns kept per (player, season, team), as for COLUMNS.
+SEASON_COLUMNS = [
+    ("player_id", "INTEGER NOT NULL", int),
+    ("season", "INTEGER NOT NULL", int),
+    ("team", "TEXT NOT NULL", str),
+    ("time", "INTEGER", int),
+    ("xG", "REAL", float),
+    ("xA", "REAL", float),
+    ("shots", "INTEGER", int),
+    ("npxG", "REAL", float),
+]
+PATH = os.path.join(understat.CACHE_DIR, "shots.sqlite")
+
+
+def _convert(convert, value):
+    if value is None or value == "":
+        return None
+    return convert(value)
+
+
+class ShotWarehouse:
+    """SQLite table of shots, plus which (player, season) pairs are loaded."""
+
+    def __init__(self, path=PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        columns = ", ".join(f'"{name}" {sql}' for name, sql, _ in COLUMNS)
+        season_columns = ", ".join(f'"{name}" {sql}' for name, sql, _ in SEASON_COLUMNS)
+        self.db.executescript(f"""
+            CREATE TABLE IF NOT EXISTS shots (
+                {columns},
+                PRIMARY KEY (season, league, player_id, id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS shots_player
+                ON shots (player_id, season);
+            CREATE TABLE IF NOT EXISTS seasons (
+                {season_columns},
+                PRIMARY KEY (player_id, season, team)
+            );
+            CREATE TABLE IF NOT EXISTS ingested (
+                player_id INTEGER NOT NULL,
+                season INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (player_id, season)
+            );
+            """)
+        self.db.commit()
+
+    @classmethod
+    def open_existing(cls, path=PATH):
+        """The warehouse at ``path``, or None if it was never created."""
+        return cls(path) if os.path.exists(path) else None
+
+    def has(self, player_id, season):
+        with self.lock:
+            return (
+                self.db.execute(
+                    "SELECT 1 FROM ingested WHERE player_id = ? AND season = ?",
+                    (int(player_id), int(season)),
+                ).fetchone()
+                is not None
+            )
+
+    def fetched_at(self, player_id, season):
+        """When a player season was last stored (epoch seconds), or None."""
+        with self.lock:
+            row = self.db.execute(
+                "SELECT fetched_at FROM ingested WHERE player_id = ? AND season = ?",
+                (int(player_id), int(season)),
+            ).fetchone()
+        return row[0] if row else None
+
+    def store_player(self, player_id, payload, season, league=None):
+        """Replace one player's shots for ``season`` with those in ``payload``.
+
+        Each shot is filed under the league of the team the player shot for,
+        falling back to ``league`` (or '' when that is unknown too). The
+        season's ``groups.season`` rows are replaced alongside.
+        """
+        rows = []
+        for shot in payload.get("shots", []):
+            if str(shot.get("season")) != str(season):
+                continue
+            team = shot.get("h_team") if shot.get("h_a") == "h" else shot.get("a_team")
+            shot_league = leagues.league_of(season, team) or league or ""
+            key = (int(season), shot_league, int(player_id), int(shot["id"]))
+            rows.append(
+                key
+                + tuple(
+                    _convert(convert, shot.get(name))
+                    for name, _, convert in COLUMNS[len(key) :]
+                )
+            )
+
+        season_rows = [
+            (int(player_id),)
+            + tuple(
+                _convert(convert, group.get(name))
+                for name, _, convert in SEASON_COLUMNS[1:]
+            )
+            for group in payload.get("groups", {}).get("season", [])
+            if str(group.get("season")) == str(season)
+        ]
+
+        placeholders = ", ".join("?" for _ in COLUMNS)
+        season_placeholders = ", ".join("?" for _ in SEASON_COLUMNS)
+        with self.lock, self.db:
+            for table in ("shots", "seasons"):
+                self.db.execute(
+                    f"DELETE FROM {table} WHERE player_id = ? AND season = ?",
+                    (int(player_id), int(season)),
+                )
+            self.db.executemany(
+                f"INSERT OR REPLACE INTO shots VALUES ({placeholders})", rows
+            )
+            self.db.executemany(
+                f"INSERT OR REPLACE INTO seasons VALUES ({season_placeholders})",
+                season_rows,
+            )
+            self.db.execute(
+                "INSERT OR REPLACE INTO ingested VALUES (?, ?, ?)",
+                (int(player_id), int(season), time.time()),
+            )
+        return len(rows)
+
+    def ingest_league(self, league, season, refresh=False):
+        """Fetch every player of a league season and store their shots.
+
+        Returns (players stored, shots stored, players skipped).
+        """
+        data = understat.get_league_data(league, season)
+        if data is None:
+            raise RuntimeError(f"Could not fetch getLeagueData/{league}/{season}")
+        leagues.get_index().season(season)
+
+        player_ids = sorted({int(player["id"]) for player in data.get("players", [])})
+        if not refresh:
+            player_ids = [pid for pid in player_ids if not self.has(pid, season)]
+        futures = [(pid, understat.get_player_data_async(pid)) for pid in player_ids]
+
+        stored = shots = skipped = 0
+        for player_id, future in futures:
+            payload = future.result()
+            if payload is None:
+                skipped += 1
+                continue
+            shots += self.store_player(player_id, payload, season, league)
+            stored += 1
+        return stored, shots, skipped
+
+    def payload(self, player_id, season):
+        """One stored season as a getPlayerData-shaped payload, or None.
+
+        The payload holds the season's shots and ``groups.season`` rows, all
+        core.ShotSet and core.SeasonStats read. None when the season has no
+        such rows, e.g. when it was ingested before they were kept.
+        """
+        key = (int(player_id), int(season))
+        with self.lock:
+            cursor = self.db.execute(
+                "SELECT * FROM seasons WHERE player_id = ? AND season = ?", key
+            )
+            names = [column[0] for column in cursor.description]
+            groups = [dict(zip(names, row)) for row in cursor]
+            if not groups:
+                return None
+            cursor = self.db.execute(
+                "SELECT * FROM shots WHERE player_id = ? AND season = ? ORDER BY id",
+                key,
+            )
+            names = [column[0] for column in cursor.description]
+            shots = [dict(zip(names, row)) for row in cursor]
+        return {"shots": shots, "groups": {"season": groups}}
+
+    def shots(self, season=None, league=None, player_id=None, columns=None):
+        """Typed DataFrame of the shots matching every filter given.
+
+        X, Y and xG come back as float32 and the text columns with few
+        distinct values as categoricals.
+        """
+        import pandas as pd
+
+        names = [name for name, _, _ in COLUMNS]
+        selected = list(columns) if columns else names
+        unknown = set(selected) - set(names)
+        if unknown:
+            raise ValueError(f"Unknown shot columns: {sorted(unknown)}")
+
+        clauses, params = [], []
+        for name, value in (
+            ("season", season),
+            ("league", league),
+            ("player_id", player_id),
+        ):
+            if value is not None:
+                clauses.append(f"{name} = ?")
+                params.append(str(value) if name == "league" else int(value))
+        query = "SELECT " + ", ".join(f'"{name}"' for name in selected) + " FROM shots"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+
+        with self.lock:
+            df = pd.read_sql_query(query, self.db, params=params)
+        for name in FLOAT_COLUMNS:
+            if name in df:
+                df[name] = df[name].astype("float32")
+        for name in CATEGORY_COLUMNS:
+            if name in df:
+                df[name] = df[name].astype("category")
+        return df
+
+    def summary(self):
+        with self.lock:
+            return self.db.execute(
+                "SELECT season, league, COUNT(DISTINCT player_id), COUNT(*) "
+                "FROM shots GROUP BY season, league ORDER BY season, league"
+            ).fetchall()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local Understat shot warehouse.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ingest = commands.add_parser("ingest", help="fetch and store a season's shots")
+    ingest.add_argument("season", help="initial year of the season, e.g. 2024")
+    ingest.add_argument(
+        "--league",
+        action="append",
+        choices=leagues.LEAGUES,
+        help="league to ingest (repeatable, default: all)",
+    )
+    ingest.add_argument(
+        "--refresh",
+        action="store_true",
+        help="refetch players that are already in the warehouse",
+    )
+    commands.add_parser("summary", help="count stored players and shots")
+    args = parser.parse_args(argv)
+
+    warehouse = ShotWarehouse()
+    if args.command == "summary":
+        for season, league, players, shots in warehouse.summary():
+            print(
+                f"{season}  {league or '?':<10}  {players:5d} players  {shots:7d} shots"
+            )
+        return
+
+    for league in args.league or leagues.LEAGUES:
+        start = time.perf_counter()
+        stored, shots, skipped = warehouse.ingest_league(
+            league, args.season, refresh=args.refresh
+        )
+        print(
+            f"{league} {args.season}: {stored} players, {shots} shots"
+            f" ({skipped} failed) in {time.perf_counter() - start:.1f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import pytest
+
+pytest.importorskip("pandas")
+
+from shotmap import core  # noqa: E402
+
+
+def season_row(season, team, time, xg, xa, shots, npxg):
+    # groups.season values come back from Understat as strings.
+    return {
+        "season": season,
+        "team": team,
+        "time": str(time),
+        "xG": str(xg),
+        "xA": str(xa),
+        "shots": str(shots),
+        "npxG": str(npxg),
+    }
+
+
+PAYLOAD = {
+    "groups": {
+        "season": [
+            season_row("2023", "Wolves", 900, 3.0, 1.0, 20, 2.5),
+            season_row("2023", "Everton", 450, 1.5, 0.5, 10, 1.5),
+            season_row(2024, "Everton", 180, 0.4, 0.2, 4, 0.4),
+            season_row("2022", "Wolves", 0, 0, 0, 0, 0),
+        ]
+    }
+}
+
+
+def test_season_table_sums_moves_and_rates_per_90():
+    table = core.season_table(PAYLOAD)
+    assert list(table.index) == ["2024", "2023", "2022"]
+
+    row = table.loc["2023"]
+    assert row["teams"] == ["Everton", "Wolves"]
+    assert row["time"] == 1350
+    assert row["shots"] == 30
+    assert row["xg_p90"] == pytest.approx(4.5 / 15)
+    assert row["shots_p90"] == pytest.approx(2.0)
+    assert row["npxg_p90"] == pytest.approx(4.0 / 15)
+    assert row["xgi_p90"] == pytest.approx(6.0 / 15)
+
+
+def test_season_without_minutes_has_zero_rates():
+    stats = core.SeasonStats.from_table(core.season_table(PAYLOAD), "2022")
+    assert stats.per90() == dict.fromkeys(core.PER90_COLUMNS, 0.0)
+
+
+def test_season_stats_of_a_missing_season_are_empty():
+    stats = core.SeasonStats.from_payload(PAYLOAD, 2019)
+    assert stats.teams == [] and stats.shots == 0
+
+
+def test_empty_payload_gives_an_empty_table():
+    assert core.season_table({}).empty
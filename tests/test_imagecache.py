@@ -0,0 +1,50 @@
+import os
+
+from shotmap.imagecache import ImageCache
+
+
+def key(player_id):
+    return (player_id, "2024", "png@300")
+
+
+def test_memory_is_evicted_least_recently_used_first():
+    cache = ImageCache(max_bytes=30)
+    for player_id in ("1", "2", "3"):
+        cache.put(key(player_id), b"x" * 10)
+    assert cache.get(key("1")) is not None
+
+    cache.put(key("4"), b"x" * 10)
+    assert cache.get(key("2")) is None
+    assert [cache.get(key(p)) is not None for p in ("1", "3", "4")] == [True] * 3
+    info = cache.info()
+    assert info["evictions"] == 1
+    assert info["bytes"] == 30
+
+
+def test_entries_over_budget_are_not_kept():
+    cache = ImageCache(max_bytes=10)
+    cache.put(key("1"), b"x" * 11)
+    assert cache.get(key("1")) is None
+    assert cache.info()["bytes"] == 0
+
+
+def test_disk_copy_survives_memory_eviction(tmp_path):
+    cache = ImageCache(max_bytes=10, disk_dir=str(tmp_path))
+    cache.put(key("1"), b"a" * 10)
+    cache.put(key("2"), b"b" * 10)
+    assert cache.get(key("1")) == b"a" * 10
+    assert cache.stats["disk_hits"] == 1
+
+
+def test_disk_is_pruned_oldest_first(tmp_path):
+    cache = ImageCache(max_bytes=100, disk_dir=str(tmp_path), disk_bytes=20)
+    for age, player_id in enumerate(("1", "2", "3")):
+        cache.put(key(player_id), b"x" * 10)
+        # Make the files' ages distinct whatever the mtime resolution.
+        os.utime(cache._disk_path(key(player_id)), (age, age))
+    cache.put(key("4"), b"x" * 10)
+
+    kept = sorted(os.listdir(tmp_path))
+    assert kept == sorted(
+        os.path.basename(cache._disk_path(key(p))) for p in ("3", "4")
+    )
@@ -0,0 +1,81 @@
+import os
+
+import pytest
+
+from shotmap.matcher import (
+    INDEX_DIR,
+    PLAYERS_PATH,
+    Matcher,
+    TrigramIndex,
+    _remove_stale,
+)
+from shotmap.players_table import PlayersTable
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (name, has a current league), in Understat ID order.
+PLAYERS = [
+    ("mohamed salah", True),
+    ("harry kane", True),
+    ("kylian mbappe-lottin", True),
+    ("kane wilson", False),
+    ("salah basha", False),
+    ("ibrahim salah", True),
+    ("ethan mbappé", True),
+    ("cheikh kane sarr", False),
+]
+
+
+@pytest.fixture
+def matcher():
+    names = [name for name, _ in PLAYERS]
+    return Matcher(names, in_league=[in_league for _, in_league in PLAYERS])
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("salah", "mohamed salah"),
+        ("kane", "harry kane"),
+        ("mbappe", "kylian mbappe-lottin"),
+        ("basha", "salah basha"),
+        ("wilson", "kane wilson"),
+    ],
+)
+def test_shared_tokens_resolve_without_the_model(matcher, query, expected):
+    assert matcher.match(query) == expected
+    assert matcher._name_index is None
+
+
+def test_surname_beats_league():
+    index = TrigramIndex(["kane wilson", "harry kane"], in_league=[True, False])
+    candidates, confident = index.lookup("kane")
+    assert confident
+    assert candidates[0][0] == "harry kane"
+
+
+def test_readme_example_against_players_data():
+    table = PlayersTable.open(
+        os.path.join(ROOT, PLAYERS_PATH), os.path.join(ROOT, INDEX_DIR)
+    )
+    matcher = Matcher(table.names(), in_league=table.in_league())
+    assert matcher.match("salah") == "mohamed salah"
+    assert matcher._name_index is None
+
+
+def test_rebuild_only_removes_the_same_model_key(tmp_path):
+    for name in (
+        "names-model-fp32-old.npy",
+        "names-model-fp32-new.npy",
+        "names-model-int8-old.npy",
+        "hnsw-model-fp32-old.bin",
+        "phonetic-old.json",
+    ):
+        (tmp_path / name).touch()
+    _remove_stale(str(tmp_path / "names-model-fp32-new.npy"))
+    assert sorted(os.listdir(tmp_path)) == [
+        "hnsw-model-fp32-old.bin",
+        "names-model-fp32-new.npy",
+        "names-model-int8-old.npy",
+        "phonetic-old.json",
+    ]
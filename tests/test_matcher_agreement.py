@@ -0,0 +1,27 @@
+import os
+
+import pytest
+
+from shotmap import matcher
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+pytest.importorskip("sentence_transformers")
+pytest.importorskip("torch")
+# Without bundled weights load_model falls back to the hub download, which
+# only runs when asked for with SHOTMAP_MODEL_TESTS=1.
+if not (
+    matcher._has_weights(os.path.join(ROOT, matcher.MODEL_DIR))
+    or os.environ.get("SHOTMAP_MODEL_TESTS") == "1"
+):
+    pytest.skip(
+        f"no model weights in {matcher.MODEL_DIR}; set SHOTMAP_MODEL_TESTS=1 "
+        "to load them from the hub",
+        allow_module_level=True,
+    )
+
+
+def test_int8_top1_agrees_with_fp32(monkeypatch):
+    monkeypatch.chdir(ROOT)
+    results = matcher.check_agreement("int8")
+    assert results["full names"] >= 0.99
@@ -0,0 +1,112 @@
+import io
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("mplsoccer")
+
+import matplotlib  # noqa: E402
+
+matplotlib.use("Agg")
+
+import matplotlib.image as mpimg  # noqa: E402
+
+from shotmap import render  # noqa: E402
+
+SHOTS = pd.DataFrame(
+    {
+        "X": [90.0, 85.0, 88.5, 80.0],
+        "Y": [50.0, 40.0, 50.0, 30.0],
+        "xG": [0.3, 0.1, 0.76, 0.05],
+        "result": ["Goal", "SavedShot", "Goal", "MissedShots"],
+        "situation": ["OpenPlay", "OpenPlay", "Penalty", "DirectFreekick"],
+    }
+)
+STATS = {
+    "xg_p90": 0.52,
+    "shots_p90": 3.2,
+    "npxg_p90": 0.41,
+    "xgi_p90": 0.77,
+    "shots": 4,
+    "goals": 2,
+    "xg": 1.21,
+    "xg_per_shot": 0.3,
+}
+SHORT = "Shot Map at Liverpool (EPL) for the 24/25 Season"
+LONG = (
+    "Shot Map at Bayer Leverkusen (Bundesliga) + Wolverhampton Wanderers (EPL)"
+    " + Borussia Dortmund (Bundesliga) for the 24/25 Season"
+)
+LONG_CREDIT = render.CREDIT + " | EV Data: a credit line longer than the figure"
+# shot.py's credit line and where it starts.
+CLI_CREDIT = (
+    "Viz by @BetterThanMario | Github: github.com/AnayShukla"
+    " | Data: understat.com | EV Data: fplreview.com"
+)
+CLI_CREDIT_X = 0.21
+
+
+def decode(data):
+    return mpimg.imread(io.BytesIO(data))
+
+
+def savefig_image(subtitle, credit=render.CREDIT, dpi=100, credit_x=render.CREDIT_X):
+    fig = render.render_shot_map(
+        SHOTS, "Mohamed Salah", subtitle, STATS, dpi, credit, credit_x
+    )
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=dpi, bbox_inches="tight")
+    return decode(buf.getvalue())
+
+
+@pytest.mark.parametrize(
+    "subtitle, credit",
+    [(SHORT, render.CREDIT), (SHORT, LONG_CREDIT), (LONG, render.CREDIT)],
+)
+def test_render_image_matches_savefig(subtitle, credit):
+    image = decode(
+        render.render_image(SHOTS, "Mohamed Salah", subtitle, STATS, credit=credit)
+    )
+    np.testing.assert_array_equal(image, savefig_image(subtitle, credit))
+
+
+def test_cli_map_matches_savefig():
+    # At the DPI the CLI writes.
+    image = decode(
+        render.render_image(
+            SHOTS,
+            "Mohamed Salah",
+            SHORT,
+            STATS,
+            300,
+            credit=CLI_CREDIT,
+            credit_x=CLI_CREDIT_X,
+        )
+    )
+    np.testing.assert_array_equal(
+        image, savefig_image(SHORT, CLI_CREDIT, dpi=300, credit_x=CLI_CREDIT_X)
+    )
+
+
+def test_credit_x_moves_the_credit_line():
+    left = render.get_template(render.FIGSIZE, 100, CLI_CREDIT, CLI_CREDIT_X)
+    right = render.get_template(render.FIGSIZE, 100, CLI_CREDIT)
+    # The credit overflows the figure either way, so the image grows by
+    # exactly the shift.
+    shift = (render.CREDIT_X - CLI_CREDIT_X) * render.PANEL_RECTS[2][2]
+    assert right.content.width - left.content.width == pytest.approx(
+        shift * render.FIGSIZE[0], abs=0.01
+    )
+
+
+def test_template_spans_overflowing_credit():
+    template = render.get_template(render.FIGSIZE, 100, LONG_CREDIT)
+    assert template.image.shape[1] > render.FIGSIZE[0] * 100
+
+
+@pytest.mark.parametrize("subtitle, blits", [(SHORT, True), (LONG, False)])
+def test_only_overflowing_player_layers_skip_the_template(subtitle, blits):
+    template = render.get_template(render.FIGSIZE, 100, render.CREDIT)
+    layer = template.player_layer(SHOTS, "Mohamed Salah", subtitle, STATS)
+    assert template.contains(layer) is blits
@@ -0,0 +1,139 @@
+import json
+import threading
+
+import pytest
+
+from shotmap import understat
+
+PATH = "/getPlayerData/1250"
+PAYLOAD = {"shots": [], "groups": {"season": []}}
+
+
+class Clock:
+    """Stands in for the time module: sleeping only moves the clock on."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class Response:
+    def __init__(self, status_code, data=None, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.content = json.dumps(data).encode()
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class Session:
+    """Answers GETs from a script of responses, recording each request."""
+
+    def __init__(self, clock, *responses):
+        self.clock = clock
+        self.headers = {}
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests.append((url, dict(headers or {}), self.clock.now))
+        return self.responses.pop(0)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(understat, "time", clock)
+    return clock
+
+
+def client(tmp_path, session):
+    cache = understat.ResponseCache(str(tmp_path / "understat.sqlite"))
+    return understat.UnderstatClient(cache=cache, session=session)
+
+
+def test_retries_with_exponential_backoff(tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(understat.random, "uniform", lambda low, high: high)
+    session = Session(clock, Response(503), Response(503), Response(200, PAYLOAD))
+    c = client(tmp_path, session)
+    assert c.get_json(PATH, understat.PLAYER_TTL) == PAYLOAD
+    assert clock.sleeps == [understat.BACKOFF_BASE, understat.BACKOFF_BASE * 2]
+    assert c.stats["retries"] == 2
+    assert c.stats["misses"] == 1
+
+
+def test_gives_up_after_max_retries(tmp_path, clock):
+    session = Session(clock, *[Response(503)] * (understat.MAX_RETRIES + 1))
+    c = client(tmp_path, session)
+    assert c.get_json(PATH, understat.PLAYER_TTL) is None
+    assert len(session.requests) == understat.MAX_RETRIES + 1
+    assert c.stats["errors"] == 1
+
+
+def test_429_retry_after_pauses_the_bucket(tmp_path, clock):
+    session = Session(
+        clock, Response(429, headers={"Retry-After": "3"}), Response(200, PAYLOAD)
+    )
+    c = client(tmp_path, session)
+    assert c.get_json(PATH, understat.PLAYER_TTL) == PAYLOAD
+    (_, _, first), (_, _, second) = session.requests
+    assert second - first >= 3
+    assert c.stats["retries"] == 1
+
+
+def test_stale_entries_are_revalidated(tmp_path, clock):
+    session = Session(
+        clock, Response(200, PAYLOAD, headers={"ETag": '"v1"'}), Response(304)
+    )
+    c = client(tmp_path, session)
+    assert c.get_json(PATH, 60) == PAYLOAD
+    assert c.get_json(PATH, 60) == PAYLOAD
+    assert len(session.requests) == 1
+    assert c.stats["hits"] == 1
+
+    clock.now += 61
+    assert c.get_json(PATH, 60) == PAYLOAD
+    assert session.requests[-1][1]["If-None-Match"] == '"v1"'
+    assert c.stats["revalidated"] == 1
+
+
+def test_concurrent_requests_share_one_fetch(tmp_path, clock):
+    entered, release = threading.Event(), threading.Event()
+
+    class BlockingSession(Session):
+        def get(self, url, headers=None, timeout=None):
+            entered.set()
+            release.wait(5)
+            return super().get(url, headers, timeout)
+
+    session = BlockingSession(clock, Response(200, PAYLOAD))
+    c = client(tmp_path, session)
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(c.get_json(PATH, understat.PLAYER_TTL))
+        )
+        for _ in range(3)
+    ]
+    threads[0].start()
+    assert entered.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    while c.stats["coalesced"] < 2:
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert results == [PAYLOAD] * 3
+    assert len(session.requests) == 1